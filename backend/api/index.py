@@ -23,7 +23,7 @@ except ImportError:
     TWILIO_AVAILABLE = False
 
 try:
-    from jose import jwt
+    import jwt
     from passlib.context import CryptContext
     AUTH_AVAILABLE = True
 except ImportError:
@@ -162,7 +162,7 @@ async def change_password(
     """
     try:
         # Verify current password
-        if not await auth_service.verify_password(current_password, current_user.email):
+        if not await auth_service.verify_password_by_email(current_password, current_user.email):
             raise HTTPException(
                 status_code=400,
                 detail="Current password is incorrect"
@@ -1,9 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from ...models.schemas import PhishingRequest, PhishingResponse, APIResponse
-from ...services.phishing_detector import PhishingDetector
+from ...services.phishing_detector import get_phishing_detector
 from ...services.auth_service import get_current_user
 from ...services.threat_logger import ThreatLogger
+from ...utils.hashing import hash_bytes
 from ...models.schemas import User, ThreatType
 import logging
 
@@ -12,7 +13,6 @@ security = HTTPBearer()
 logger = logging.getLogger(__name__)
 
 # Initialize services
-phishing_detector = PhishingDetector()
 threat_logger = ThreatLogger()
 
 @router.post("/analyze", response_model=APIResponse)
@@ -27,7 +27,7 @@ async def analyze_phishing(
     """
     try:
         # Perform phishing detection
-        result = await phishing_detector.analyze(
+        result = await get_phishing_detector().analyze(
             url=request.url,
             content=request.content,
             domain=request.domain,
@@ -41,6 +41,7 @@ async def analyze_phishing(
             threat_type=ThreatType.PHISHING,
             risk_score=result.risk_score,
             url=request.url,
+            content_hash=hash_bytes(request.content.encode()) if request.content else None,
             detection_details=result.analysis_details
         )
         
@@ -80,8 +81,8 @@ async def bulk_analyze_phishing(
     try:
         results = []
         
-        for url in urls:
-            result = await phishing_detector.analyze(url=url)
+        analyses = await get_phishing_detector().analyze_batch(urls)
+        for url, result in zip(urls, analyses):
             results.append({
                 "url": url,
                 "is_phishing": result.is_phishing,
@@ -118,7 +119,7 @@ async def get_model_info():
     Get information about the phishing detection model
     """
     try:
-        model_info = await phishing_detector.get_model_info()
+        model_info = await get_phishing_detector().get_model_info()
         return APIResponse(
             success=True,
             message="Model information retrieved",
@@ -131,6 +132,34 @@ async def get_model_info():
             detail="Failed to retrieve model information"
         )
 
+@router.get("/dashboard", response_model=APIResponse)
+async def get_threat_dashboard(
+    days: int = 30,
+    limit: int = 10,
+    current_user: User = Depends(get_current_user),
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """
+    Get the user's threat statistics and top threat domains for the last `days` days
+    """
+    try:
+        dashboard = await threat_logger.get_dashboard(
+            user_id=current_user.id,
+            days=days,
+            limit=limit
+        )
+        return APIResponse(
+            success=True,
+            message="Threat dashboard retrieved",
+            data=dashboard
+        )
+    except Exception as e:
+        logger.error(f"Failed to get threat dashboard: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail="Failed to retrieve threat dashboard"
+        )
+
 @router.post("/report-false-positive", response_model=APIResponse)
 async def report_false_positive(
     url: str,
@@ -1,9 +1,10 @@
 from fastapi import APIRouter
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 from typing import Optional
+import bisect
 import re
 from urllib.parse import urlparse
-from ...services.phishing_detector import PhishingDetector
+from ...services.phishing_detector import get_phishing_detector
 
 router = APIRouter()
 
@@ -19,8 +20,27 @@ class QuickScanResponse(BaseModel):
     message: str
     indicators: list
 
-# Initialize detector
-phishing_detector = PhishingDetector()
+    model_config = ConfigDict(frozen=True)
+
+# Risk level bands: 0-40% = SAFE (green), 40-70% = MEDIUM (yellow), 70-100% = DANGER (red)
+_RISK_THRESHOLDS = (0.4, 0.7)
+_RISK_LEVELS = (
+    ("SAFE", True, "✓ Safe - No threats detected"),
+    ("MEDIUM", False, "⚠️ MEDIUM RISK - Suspicious activity detected. Proceed with caution."),
+    ("DANGER", False, "🚨 DANGER - Phishing/Malware Detected! Do not proceed!"),
+)
+
+def _fast_split(url: str):
+    """Split a URL into (scheme, netloc, query) without the full urlparse machinery"""
+    scheme, _, rest = url.partition('://')
+    if not rest or not scheme.isalpha():
+        # No explicit scheme - defer to urlparse for the odd cases
+        parsed = urlparse(url)
+        return parsed.scheme, parsed.netloc, parsed.query
+    rest = rest.partition('#')[0]
+    host_path, _, query = rest.partition('?')
+    netloc = host_path.split('/', 1)[0]
+    return scheme.lower(), netloc, query
 
 @router.post("/quick-scan")
 async def quick_scan(request: QuickScanRequest):
@@ -29,13 +49,13 @@ async def quick_scan(request: QuickScanRequest):
     """
     try:
         url = request.url
-        parsed_url = urlparse(url)
+        scheme, netloc, query = _fast_split(url)
 
         risk_score = 0.0
         indicators = []
 
         # Use advanced phishing detection
-        phishing_result = await phishing_detector.analyze(url, request.content)
+        phishing_result = await get_phishing_detector().analyze(url, request.content)
         
         # Start with the phishing detector's score as base
         risk_score = phishing_result.risk_score
@@ -43,20 +63,20 @@ async def quick_scan(request: QuickScanRequest):
             indicators.extend([f"⚠️ {indicator}" for indicator in phishing_result.threat_indicators])
 
         # Enhanced malware and suspicious site detection
-        malware_indicators = await _analyze_malware_patterns(url, parsed_url)
+        malware_indicators = await _analyze_malware_patterns(url, query)
         if malware_indicators['score'] > 0:
             risk_score = max(risk_score, risk_score + malware_indicators['score'] * 0.3)
             indicators.extend(malware_indicators['indicators'])
 
         # Additional suspicious patterns
-        pattern_indicators = _analyze_suspicious_patterns(url, parsed_url)
+        pattern_indicators = _analyze_suspicious_patterns(url, scheme, netloc)
         if pattern_indicators['score'] > 0:
             risk_score = max(risk_score, risk_score + pattern_indicators['score'] * 0.2)
             indicators.extend(pattern_indicators['indicators'])
 
         # Brand impersonation detection boost
         brand_names = ['paypal', 'amazon', 'microsoft', 'apple', 'google', 'netflix', 'facebook', 'instagram', 'twitter', 'linkedin', 'bank']
-        domain = parsed_url.netloc.lower().replace('www.', '')
+        domain = netloc.lower().replace('www.', '')
         
         # List of legitimate domain patterns
         legitimate_domains_exact = {
@@ -106,22 +126,8 @@ async def quick_scan(request: QuickScanRequest):
         # Cap risk score at 1.0
         risk_score = min(risk_score, 1.0)
 
-        # Determine risk level and safety based on thresholds:
-        # 0-40% = SAFE (green)
-        # 40-70% = MEDIUM (yellow) 
-        # 70-100% = DANGER (red)
-        if risk_score >= 0.7:
-            risk_level = "DANGER"
-            is_safe = False
-            message = "🚨 DANGER - Phishing/Malware Detected! Do not proceed!"
-        elif risk_score >= 0.4:
-            risk_level = "MEDIUM"
-            is_safe = False
-            message = "⚠️ MEDIUM RISK - Suspicious activity detected. Proceed with caution."
-        else:
-            risk_level = "SAFE"
-            is_safe = True
-            message = "✓ Safe - No threats detected"
+        # Determine risk level and safety based on thresholds
+        risk_level, is_safe, message = _RISK_LEVELS[bisect.bisect_right(_RISK_THRESHOLDS, risk_score)]
 
         if not indicators:
             indicators = ["No suspicious patterns detected"]
@@ -154,7 +160,7 @@ async def health_check():
         "version": "1.0.0"
     }
 
-async def _analyze_malware_patterns(url: str, parsed_url) -> dict:
+async def _analyze_malware_patterns(url: str, query: str) -> dict:
     """Analyze URL for malware distribution patterns"""
     score = 0.0
     indicators = []
@@ -193,7 +199,7 @@ async def _analyze_malware_patterns(url: str, parsed_url) -> dict:
             break
 
     # Check for suspicious query parameters
-    query_params = parsed_url.query.lower()
+    query_params = query.lower()
     suspicious_params = ['exe', 'download', 'run', 'exec', 'cmd', 'shell']
 
     for param in suspicious_params:
@@ -207,74 +213,42 @@ async def _analyze_malware_patterns(url: str, parsed_url) -> dict:
         'indicators': indicators
     }
 
-def _analyze_suspicious_patterns(url: str, parsed_url) -> dict:
+# Weighted URL heuristics used by _analyze_suspicious_patterns
+_SUSPICIOUS_KEYWORDS = (
+    'login', 'verify', 'account', 'secure', 'update', 'confirm',
+    'banking', 'paypal', 'amazon', 'microsoft', 'apple', 'google',
+    'suspended', 'locked', 'billing', 'payment', 'credit', 'card',
+    'password', 'security', 'alert', 'warning', 'urgent', 'immediate',
+    'click', 'here', 'now', 'act', 'fast', 'quick', 'limited', 'time'
+)
+_SUSPICIOUS_TLDS = ('.tk', '.ml', '.ga', '.cf', '.gq', '.xyz', '.top', '.club', '.online', '.site')
+_SUSPICIOUS_CHARS = ('<', '>', '"', "'", ';', '|', '&', '$', '`')
+_IP_NETLOC_RE = re.compile(r'\d+\.\d+\.\d+\.\d+')
+
+def _analyze_suspicious_patterns(url: str, scheme: str, netloc: str) -> dict:
     """Analyze URL for general suspicious patterns"""
-    score = 0.0
-    indicators = []
-
-    # Check for HTTPS
-    if parsed_url.scheme != 'https':
-        score += 0.2
-        indicators.append("🔒 No HTTPS encryption")
-
-    # Enhanced suspicious keywords
-    suspicious_keywords = [
-        'login', 'verify', 'account', 'secure', 'update', 'confirm',
-        'banking', 'paypal', 'amazon', 'microsoft', 'apple', 'google',
-        'suspended', 'locked', 'billing', 'payment', 'credit', 'card',
-        'password', 'security', 'alert', 'warning', 'urgent', 'immediate',
-        'click', 'here', 'now', 'act', 'fast', 'quick', 'limited', 'time'
-    ]
-
     url_lower = url.lower()
-    keyword_matches = [kw for kw in suspicious_keywords if kw in url_lower]
-
-    if len(keyword_matches) >= 4:
-        score += 0.5
-        indicators.append(f"🔍 Multiple suspicious keywords: {', '.join(keyword_matches[:4])}")
-    elif len(keyword_matches) >= 2:
-        score += 0.3
-        indicators.append(f"🔍 Suspicious keywords detected: {', '.join(keyword_matches)}")
-
-    # Check for IP address in URL
-    if re.match(r'\d+\.\d+\.\d+\.\d+', parsed_url.netloc):
-        score += 0.4
-        indicators.append("🌐 IP address instead of domain name")
-
-    # Enhanced suspicious TLDs
-    suspicious_tlds = ['.tk', '.ml', '.ga', '.cf', '.gq', '.xyz', '.top', '.club', '.online', '.site']
-    if any(parsed_url.netloc.endswith(tld) for tld in suspicious_tlds):
-        score += 0.4
-        indicators.append("🏴 Suspicious domain extension")
-
-    # Check URL length
-    if len(url) > 120:
-        score += 0.2
-        indicators.append("📏 Unusually long URL")
-
-    # Check for excessive subdomains
-    subdomain_count = parsed_url.netloc.count('.')
-    if subdomain_count > 4:
-        score += 0.3
-        indicators.append(f"🔗 Excessive subdomains ({subdomain_count})")
-
-    # Check for @ symbol in URL (phishing technique)
-    if '@' in url:
-        score += 0.5
-        indicators.append("✉️ @ symbol in URL (phishing technique)")
-
-    # Check for URL encoding abuse
-    encoded_chars = url.count('%')
-    if encoded_chars > 5:
-        score += 0.2
-        indicators.append("🔤 Excessive URL encoding")
-
-    # Check for suspicious characters
-    suspicious_chars = ['<', '>', '"', "'", ';', '|', '&', '$', '`']
-    char_count = sum(url.count(char) for char in suspicious_chars)
-    if char_count > 2:
-        score += 0.3
-        indicators.append("⚠️ Suspicious characters in URL")
+    keyword_matches = [kw for kw in _SUSPICIOUS_KEYWORDS if kw in url_lower]
+    subdomain_count = netloc.count('.')
+
+    # Evaluate every heuristic up front, then sum the weights of those that fired
+    checks = (
+        (scheme != 'https', 0.2, "🔒 No HTTPS encryption"),
+        (len(keyword_matches) >= 4, 0.5,
+         f"🔍 Multiple suspicious keywords: {', '.join(keyword_matches[:4])}"),
+        (2 <= len(keyword_matches) < 4, 0.3,
+         f"🔍 Suspicious keywords detected: {', '.join(keyword_matches)}"),
+        (_IP_NETLOC_RE.match(netloc) is not None, 0.4, "🌐 IP address instead of domain name"),
+        (netloc.endswith(_SUSPICIOUS_TLDS), 0.4, "🏴 Suspicious domain extension"),
+        (len(url) > 120, 0.2, "📏 Unusually long URL"),
+        (subdomain_count > 4, 0.3, f"🔗 Excessive subdomains ({subdomain_count})"),
+        ('@' in url, 0.5, "✉️ @ symbol in URL (phishing technique)"),
+        (url.count('%') > 5, 0.2, "🔤 Excessive URL encoding"),
+        (sum(url.count(char) for char in _SUSPICIOUS_CHARS) > 2, 0.3, "⚠️ Suspicious characters in URL"),
+    )
+
+    score = sum(weight for fired, weight, _ in checks if fired)
+    indicators = [message for fired, _, message in checks if fired]
 
     return {
         'score': min(score, 1.0),
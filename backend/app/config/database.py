@@ -1,9 +1,13 @@
 from motor.motor_asyncio import AsyncIOMotorClient
 from .settings import get_settings
+import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Bump whenever create_indexes() changes so existing deployments pick it up
+INDEX_VERSION = 5
+
 class Database:
     client: AsyncIOMotorClient = None
     database = None
@@ -14,15 +18,26 @@ async def connect_to_mongo():
     """Create database connection"""
     settings = get_settings()
     try:
-        db.client = AsyncIOMotorClient(settings.mongodb_url)
+        # tz_aware so stored datetimes come back comparable with datetime.now(timezone.utc)
+        db.client = AsyncIOMotorClient(settings.mongodb_url, tz_aware=True)
         db.database = db.client[settings.database_name]
 
         # Test the connection
         await db.client.admin.command('ping')
         logger.info("Successfully connected to MongoDB")
 
-        # Create indexes
-        await create_indexes()
+        # Create indexes only when the stored marker is behind the code
+        meta = db.database["_meta"]
+        marker = await meta.find_one({"_id": "idx"})
+        if marker and marker.get("v") == INDEX_VERSION:
+            return
+
+        if await create_indexes():
+            await meta.update_one(
+                {"_id": "idx"},
+                {"$set": {"v": INDEX_VERSION}},
+                upsert=True
+            )
 
     except Exception as e:
         logger.warning(f"Failed to connect to MongoDB: {e}")
@@ -36,27 +51,69 @@ async def close_mongo_connection():
         db.client.close()
         logger.info("Disconnected from MongoDB")
 
-async def create_indexes():
+async def _convert_mfa_expiry_index():
+    """Turn a pre-existing plain expires_at index into the TTL index"""
+    indexes = await db.database.mfa_sessions.index_information()
+    legacy = indexes.get("expires_at_1")
+    if legacy is None or "expireAfterSeconds" in legacy:
+        return
+
+    try:
+        # MongoDB 5.1+ can convert the index in place
+        await db.database.command(
+            "collMod", "mfa_sessions",
+            index={"keyPattern": {"expires_at": 1}, "expireAfterSeconds": 0}
+        )
+    except Exception:
+        # Older servers: drop it and let create_indexes() rebuild it as TTL
+        await db.database.mfa_sessions.drop_index("expires_at_1")
+
+async def create_indexes() -> bool:
     """Create database indexes for better performance"""
     try:
+        await _convert_mfa_expiry_index()
+    except Exception as e:
+        logger.warning(f"Failed to convert mfa_sessions.expires_at to a TTL index: {e}")
+
+    specs = [
         # Users collection indexes
-        await db.database.users.create_index("email", unique=True)
-        await db.database.users.create_index("created_at")
-        
+        (db.database.users, "email", {"unique": True}),
+        (db.database.users, "created_at", {}),
+
         # Threat logs collection indexes
-        await db.database.threat_logs.create_index("timestamp")
-        await db.database.threat_logs.create_index("user_id")
-        await db.database.threat_logs.create_index("threat_type")
-        await db.database.threat_logs.create_index("risk_score")
-        
+        # timestamp_1 also serves newest-first sorts (indexes scan both ways)
+        (db.database.threat_logs, "timestamp", {}),
+        (db.database.threat_logs, "user_id", {}),
+        # Per-user history, newest first, without an in-memory sort
+        (db.database.threat_logs, [("user_id", 1), ("timestamp", -1)], {}),
+        (db.database.threat_logs, "domain", {}),
+        (db.database.threat_logs, "threat_type", {}),
+        (db.database.threat_logs, "risk_score", {}),
+
         # MFA sessions collection indexes
-        await db.database.mfa_sessions.create_index("session_id", unique=True)
-        await db.database.mfa_sessions.create_index("expires_at")
-        
-        logger.info("Database indexes created successfully")
-        
-    except Exception as e:
-        logger.warning(f"Failed to create some indexes: {e}")
+        (db.database.mfa_sessions, "session_id", {"unique": True}),
+        # TTL index: Mongo purges sessions once expires_at has passed
+        (db.database.mfa_sessions, "expires_at", {"expireAfterSeconds": 0}),
+    ]
+
+    # Indexes are independent, so issue them concurrently
+    results = await asyncio.gather(
+        *(collection.create_index(keys, **options) for collection, keys, options in specs),
+        return_exceptions=True
+    )
+
+    failed = 0
+    for (collection, keys, _), result in zip(specs, results):
+        if isinstance(result, Exception):
+            failed += 1
+            logger.warning(f"Failed to create index {collection.name}.{keys}: {result}")
+
+    if failed:
+        logger.warning(f"{failed} of {len(specs)} database indexes could not be created")
+        return False
+
+    logger.info("Database indexes created successfully")
+    return True
 
 def get_database():
     """Get database instance"""
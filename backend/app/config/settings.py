@@ -1,76 +1,139 @@
-from pydantic_settings import BaseSettings
-from typing import Optional
+from dataclasses import dataclass
+from typing import Optional, Tuple
 import os
 
-class Settings(BaseSettings):
+
+def _env(name: str, default: Optional[str] = None) -> Optional[str]:
+    """Read an environment variable, treating empty values as unset"""
+    value = os.environ.get(name)
+    return value if value not in (None, "") else default
+
+def _env_int(name: str, default: int) -> int:
+    value = _env(name)
+    return int(value) if value is not None else default
+
+def _env_float(name: str, default: float) -> float:
+    value = _env(name)
+    return float(value) if value is not None else default
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = _env(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+@dataclass(frozen=True, slots=True)
+class Settings:
     # API Configuration
     api_host: str = "0.0.0.0"
     api_port: int = 8000
     api_workers: int = 1
     debug: bool = False
-    
+
     # Database Configuration
-    mongodb_url: str = os.getenv("MONGODB_URL", "mongodb://localhost:27017/scamcap")
-    
+    mongodb_url: str = "mongodb://localhost:27017/scamcap"
+
     # JWT Configuration
-    secret_key: str = os.getenv("JWT_SECRET_KEY", "your-super-secret-key-change-in-production")
+    secret_key: str = "your-super-secret-key-change-in-production"
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 30
-    
+
     # Risk Thresholds
     phishing_threshold: float = 0.7
     deepfake_threshold: float = 0.8
-    mfa_trigger_threshold: float = 0.7
-    
-    # ML Models (Optional - placeholder implementation used)
-    phishing_model_path: Optional[str] = None
-    deepfake_model_path: Optional[str] = None
-    
-    # Risk Thresholds
     phishing_risk_threshold: float = 0.7
     deepfake_risk_threshold: float = 0.8
     mfa_trigger_threshold: float = 0.9
-    
+
+    # ML Models (Optional - placeholder implementation used)
+    phishing_model_path: Optional[str] = None
+    deepfake_model_path: Optional[str] = None
+
     # External Services
     twilio_account_sid: Optional[str] = None
     twilio_auth_token: Optional[str] = None
     twilio_phone_number: Optional[str] = None
-    
-    
+
     # Environment
     environment: str = "development"
-    
+
     # CORS
     allowed_origins: str = "chrome-extension://*,http://localhost:3000"
-    
+
     # Redis Configuration
     redis_url: str = "redis://localhost:6379/0"
-    
+
     # AWS Configuration
     aws_access_key_id: Optional[str] = None
     aws_secret_access_key: Optional[str] = None
     aws_s3_bucket: Optional[str] = None
     aws_region: str = "us-east-1"
-    
+
     # Logging
     log_level: str = "INFO"
     log_format: str = "json"
-    
+
     # File Upload
     max_file_size: int = 100 * 1024 * 1024  # 100MB
-    allowed_extensions: list = [".jpg", ".jpeg", ".png", ".mp4", ".avi", ".mov"]
-    
+    allowed_extensions: Tuple[str, ...] = (".jpg", ".jpeg", ".png", ".mp4", ".avi", ".mov")
+
     # Database name
     database_name: str = "scamcap"
-    
-    # Server configuration  
+
+    # Server configuration
     host: str = "0.0.0.0"
     port: int = 8000
-    
-    class Config:
-        env_file = ".env"
-        case_sensitive = False
-        extra = "ignore"  # Allow extra fields from environment
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        """Build settings from the process environment (and .env when available)"""
+        try:
+            from dotenv import load_dotenv
+            load_dotenv()
+        except ImportError:
+            pass
+
+        defaults = cls()
+        return cls(
+            api_host=_env("API_HOST", defaults.api_host),
+            api_port=_env_int("API_PORT", defaults.api_port),
+            api_workers=_env_int("API_WORKERS", defaults.api_workers),
+            debug=_env_bool("DEBUG", defaults.debug),
+            mongodb_url=_env("MONGODB_URL", defaults.mongodb_url),
+            secret_key=_env("SECRET_KEY", _env("JWT_SECRET_KEY", defaults.secret_key)),
+            algorithm=_env("ALGORITHM", defaults.algorithm),
+            access_token_expire_minutes=_env_int(
+                "ACCESS_TOKEN_EXPIRE_MINUTES", defaults.access_token_expire_minutes
+            ),
+            phishing_threshold=_env_float("PHISHING_THRESHOLD", defaults.phishing_threshold),
+            deepfake_threshold=_env_float("DEEPFAKE_THRESHOLD", defaults.deepfake_threshold),
+            phishing_risk_threshold=_env_float(
+                "PHISHING_RISK_THRESHOLD", defaults.phishing_risk_threshold
+            ),
+            deepfake_risk_threshold=_env_float(
+                "DEEPFAKE_RISK_THRESHOLD", defaults.deepfake_risk_threshold
+            ),
+            mfa_trigger_threshold=_env_float("MFA_TRIGGER_THRESHOLD", defaults.mfa_trigger_threshold),
+            phishing_model_path=_env("PHISHING_MODEL_PATH"),
+            deepfake_model_path=_env("DEEPFAKE_MODEL_PATH"),
+            twilio_account_sid=_env("TWILIO_ACCOUNT_SID"),
+            twilio_auth_token=_env("TWILIO_AUTH_TOKEN"),
+            twilio_phone_number=_env("TWILIO_PHONE_NUMBER"),
+            environment=_env("ENVIRONMENT", defaults.environment),
+            allowed_origins=_env("ALLOWED_ORIGINS", defaults.allowed_origins),
+            redis_url=_env("REDIS_URL", defaults.redis_url),
+            aws_access_key_id=_env("AWS_ACCESS_KEY_ID"),
+            aws_secret_access_key=_env("AWS_SECRET_ACCESS_KEY"),
+            aws_s3_bucket=_env("AWS_S3_BUCKET"),
+            aws_region=_env("AWS_REGION", defaults.aws_region),
+            log_level=_env("LOG_LEVEL", defaults.log_level),
+            log_format=_env("LOG_FORMAT", defaults.log_format),
+            max_file_size=_env_int("MAX_FILE_SIZE", defaults.max_file_size),
+            database_name=_env("DATABASE_NAME", defaults.database_name),
+            host=_env("HOST", defaults.host),
+            port=_env_int("PORT", defaults.port),
+        )
 
 # Global settings instance
 _settings = None
@@ -78,5 +141,5 @@ _settings = None
 def get_settings() -> Settings:
     global _settings
     if _settings is None:
-        _settings = Settings()
+        _settings = Settings.from_env()
     return _settings
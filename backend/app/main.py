@@ -1,5 +1,6 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 import os
 import sys
 import logging
@@ -15,34 +16,21 @@ try:
 except Exception as e:
     logger.info("dotenv not loaded (not needed in production)")
 
-# Import routes - try multiple import styles for different environments
+# Import routes (app package layout, as deployed from backend/)
 routes_loaded = False
 import_error = None
 
-# Try relative imports first (for Vercel/standalone backend), then absolute imports (for root project)
 try:
     logger.info("Attempting to import routes...")
     
-    # Try backend.app imports (when running from project root via start_server.py)
-    try:
-        from backend.app.api.routes.phishing import router as phishing_router
-        from backend.app.api.routes.deepfake import router as deepfake_router
-        from backend.app.api.routes.auth import router as auth_router
-        from backend.app.api.routes.mfa import router as mfa_router
-        from backend.app.api.routes.test import router as test_router
-        from backend.app.config.database import connect_to_mongo, close_mongo_connection
-        from backend.app.config.settings import get_settings
-        logger.info("✓ Imported using backend.app prefix")
-    except ImportError:
-        # Try app imports (when running from backend folder / Vercel)
-        from app.api.routes.phishing import router as phishing_router
-        from app.api.routes.deepfake import router as deepfake_router
-        from app.api.routes.auth import router as auth_router
-        from app.api.routes.mfa import router as mfa_router
-        from app.api.routes.test import router as test_router
-        from app.config.database import connect_to_mongo, close_mongo_connection
-        from app.config.settings import get_settings
-        logger.info("✓ Imported using app prefix")
+    from app.api.routes.phishing import router as phishing_router
+    from app.api.routes.deepfake import router as deepfake_router
+    from app.api.routes.auth import router as auth_router
+    from app.api.routes.mfa import router as mfa_router
+    from app.api.routes.test import router as test_router
+    from app.config.database import connect_to_mongo, close_mongo_connection
+    from app.services.threat_logger import ThreatLogger
+    from app.config.settings import get_settings
     
     routes_loaded = True
     logger.info("All imports successful!")
@@ -59,7 +47,8 @@ app = FastAPI(
     description="AI-powered phishing and deepfake detection service",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=ORJSONResponse
 )
 
 # CORS middleware - Allow all origins for local development
@@ -80,6 +69,12 @@ app.add_middleware(
 # async def shutdown_event():
 #     await close_mongo_connection()
 
+# Threat logs are written in background batches; don't lose the last ones
+@app.on_event("shutdown")
+async def flush_threat_logs():
+    if routes_loaded:
+        await ThreatLogger().flush()
+
 # Include API routes only if they loaded successfully
 if routes_loaded:
     try:
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field, EmailStr
+from pydantic import BaseModel, ConfigDict, Field, EmailStr
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 from enum import Enum
@@ -69,6 +69,8 @@ class PhishingResponse(BaseModel):
     safe_alternatives: Optional[List[str]] = None
     analysis_details: Dict[str, Any]
 
+    model_config = ConfigDict(frozen=True)
+
 # Deepfake Detection Models
 class DeepfakeRequest(BaseModel):
     file_type: str  # image, video
@@ -83,6 +85,8 @@ class DeepfakeResponse(BaseModel):
     frame_analysis: Optional[List[Dict[str, float]]] = None
     temporal_consistency: Optional[float] = None
 
+    model_config = ConfigDict(frozen=True)
+
 # MFA Models
 class MFARequest(BaseModel):
     user_id: str
@@ -157,8 +161,12 @@ class APIResponse(BaseModel):
     data: Optional[Any] = None
     timestamp: datetime = Field(default_factory=datetime.utcnow)
 
+    model_config = ConfigDict(frozen=True)
+
 class ErrorResponse(BaseModel):
     error: str
     message: str
     code: int
     timestamp: datetime = Field(default_factory=datetime.utcnow)
+
+    model_config = ConfigDict(frozen=True)
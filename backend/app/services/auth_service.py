@@ -1,33 +1,72 @@
 import asyncio
+import copy
+import hashlib
 import logging
-from datetime import datetime, timedelta
-from typing import Optional
-from jose import JWTError, jwt
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+from bson import ObjectId
+import jwt
+from jwt import InvalidTokenError as JWTError
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from ..models.schemas import UserCreate, UserUpdate, User, Token, TokenData
 from ..config.database import get_database
 from ..config.settings import get_settings
+from ..utils.cache import TTLCache
 import uuid
 
 logger = logging.getLogger(__name__)
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Password hashing; rounds pinned so passlib never has to probe a default
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=12)
+
+def _warm_password_backend() -> None:
+    """Load and self-test the bcrypt backend now rather than on the first login"""
+    try:
+        pwd_context.handler().get_backend()
+    except Exception as e:
+        logger.warning(f"bcrypt backend warmup failed: {e}")
+
+_warm_password_backend()
 security = HTTPBearer()
 
+# Verified tokens (and the users they resolve to) are cached briefly so repeat
+# requests skip the HMAC/JSON decode and the Mongo lookup
+TOKEN_CACHE_TTL = 5.0
+# Callers get their own copies, so one request can't alter another's User
+_token_cache = TTLCache(maxsize=10_000, ttl=TOKEN_CACHE_TTL, copy=copy.deepcopy)
+_user_cache = TTLCache(maxsize=10_000, ttl=TOKEN_CACHE_TTL, copy=copy.deepcopy)
+
+# In-flight user lookups by token key, so a burst of requests carrying the
+# same token shares one verification and one Mongo query
+_inflight: Dict[bytes, "asyncio.Future[Optional[User]]"] = {}
+
+# Fields needed to build a User; keeps BSON decode small on the hot lookups
+_USER_PROJECTION = {
+    "email": 1, "full_name": 1, "phone_number": 1, "is_active": 1,
+    "mfa_enabled": 1, "mfa_methods": 1, "created_at": 1, "updated_at": 1
+}
+_AUTH_PROJECTION = {**_USER_PROJECTION, "hashed_password": 1}
+
+def _token_key(token: str) -> bytes:
+    """Fixed-size cache key for a bearer token"""
+    return hashlib.blake2b(token.encode(), digest_size=16).digest()
+
 class AuthService:
     def __init__(self):
         self.settings = get_settings()
+        self._token_ttl = timedelta(minutes=self.settings.access_token_expire_minutes)
+        self._token_ttl_seconds = int(self._token_ttl.total_seconds())
 
-    def verify_password(self, plain_password: str, hashed_password: str) -> bool:
-        """Verify a password against its hash"""
-        return pwd_context.verify(plain_password, hashed_password)
+    async def verify_password(self, plain_password: str, hashed_password: str) -> bool:
+        """Verify a password against its hash (bcrypt runs off the event loop)"""
+        return await asyncio.to_thread(pwd_context.verify, plain_password, hashed_password)
 
-    def get_password_hash(self, password: str) -> str:
-        """Hash a password"""
-        return pwd_context.hash(password)
+    async def get_password_hash(self, password: str) -> str:
+        """Hash a password (bcrypt runs off the event loop)"""
+        return await asyncio.to_thread(pwd_context.hash, password)
 
     async def get_user_by_email(self, email: str) -> Optional[User]:
         """Get user by email"""
@@ -37,7 +76,7 @@ class AuthService:
                 logger.warning("Database not available, cannot get user by email")
                 return None
                 
-            user_data = await db.users.find_one({"email": email})
+            user_data = await db.users.find_one({"email": email}, _USER_PROJECTION)
             
             if user_data:
                 user_data["id"] = str(user_data["_id"])
@@ -51,7 +90,6 @@ class AuthService:
     async def get_user_by_id(self, user_id: str) -> Optional[User]:
         """Get user by ID"""
         try:
-            from bson import ObjectId
             db = get_database()
             if db is None:
                 logger.warning("Database not available, cannot get user by ID")
@@ -71,21 +109,18 @@ class AuthService:
     async def authenticate_user(self, email: str, password: str) -> Optional[User]:
         """Authenticate user with email and password"""
         try:
-            user = await self.get_user_by_email(email)
-            if not user:
-                return None
-            
             db = get_database()
             if db is None:
                 logger.warning("Database not available, cannot authenticate")
                 return None
                 
-            user_doc = await db.users.find_one({"email": email})
+            user_doc = await db.users.find_one({"email": email}, _AUTH_PROJECTION)
             
-            if not user_doc or not self.verify_password(password, user_doc.get("hashed_password", "")):
+            if not user_doc or not await self.verify_password(password, user_doc.get("hashed_password", "")):
                 return None
             
-            return user
+            user_doc["id"] = str(user_doc["_id"])
+            return User(**user_doc)
             
         except Exception as e:
             logger.error(f"Authentication failed: {e}")
@@ -102,9 +137,10 @@ class AuthService:
                 )
             
             # Hash password
-            hashed_password = self.get_password_hash(user_data.password)
+            hashed_password = await self.get_password_hash(user_data.password)
             
             # Create user document
+            now = datetime.now(timezone.utc)
             user_doc = {
                 "_id": str(uuid.uuid4()),
                 "email": user_data.email,
@@ -114,8 +150,8 @@ class AuthService:
                 "is_active": user_data.is_active,
                 "mfa_enabled": False,
                 "mfa_methods": [],
-                "created_at": datetime.utcnow(),
-                "updated_at": datetime.utcnow()
+                "created_at": now,
+                "updated_at": now
             }
             
             # Insert user
@@ -135,7 +171,6 @@ class AuthService:
     async def update_user(self, user_id: str, user_update: UserUpdate) -> User:
         """Update user information"""
         try:
-            from bson import ObjectId
             db = get_database()
             if db is None:
                 raise HTTPException(
@@ -152,7 +187,7 @@ class AuthService:
             if user_update.is_active is not None:
                 update_data["is_active"] = user_update.is_active
             
-            update_data["updated_at"] = datetime.utcnow()
+            update_data["updated_at"] = datetime.now(timezone.utc)
             
             # Update user
             await db.users.update_one(
@@ -174,7 +209,6 @@ class AuthService:
     async def update_password(self, user_id: str, new_password: str):
         """Update user password"""
         try:
-            from bson import ObjectId
             db = get_database()
             if db is None:
                 raise HTTPException(
@@ -182,13 +216,13 @@ class AuthService:
                     detail="Database not available"
                 )
             
-            hashed_password = self.get_password_hash(new_password)
+            hashed_password = await self.get_password_hash(new_password)
             
             await db.users.update_one(
                 {"_id": ObjectId(user_id)},
                 {"$set": {
                     "hashed_password": hashed_password,
-                    "updated_at": datetime.utcnow()
+                    "updated_at": datetime.now(timezone.utc)
                 }}
             )
             
@@ -199,20 +233,20 @@ class AuthService:
                 detail="Failed to update password"
             )
 
-    async def verify_password(self, password: str, email: str) -> bool:
-        """Verify user password"""
+    async def verify_password_by_email(self, password: str, email: str) -> bool:
+        """Verify the password of the user with the given email"""
         try:
             db = get_database()
             if db is None:
                 logger.warning("Database not available, cannot verify password")
                 return False
                 
-            user_doc = await db.users.find_one({"email": email})
+            user_doc = await db.users.find_one({"email": email}, {"hashed_password": 1})
             
             if not user_doc:
                 return False
             
-            return pwd_context.verify(password, user_doc.get("hashed_password", ""))
+            return await self.verify_password(password, user_doc.get("hashed_password", ""))
             
         except Exception as e:
             logger.error(f"Password verification failed: {e}")
@@ -222,7 +256,7 @@ class AuthService:
         """Create JWT access token"""
         try:
             to_encode = data.copy()
-            expire = datetime.utcnow() + timedelta(minutes=self.settings.access_token_expire_minutes)
+            expire = datetime.now(timezone.utc) + self._token_ttl
             to_encode.update({"exp": expire})
             
             encoded_jwt = jwt.encode(
@@ -234,7 +268,7 @@ class AuthService:
             return Token(
                 access_token=encoded_jwt,
                 token_type="bearer",
-                expires_in=self.settings.access_token_expire_minutes * 60
+                expires_in=self._token_ttl_seconds
             )
             
         except Exception as e:
@@ -246,6 +280,11 @@ class AuthService:
 
     async def verify_token(self, token: str) -> Optional[TokenData]:
         """Verify JWT token"""
+        key = _token_key(token)
+        cached = _token_cache.get(key)
+        if cached is not None:
+            return cached
+
         try:
             payload = jwt.decode(
                 token, 
@@ -256,11 +295,29 @@ class AuthService:
             if email is None:
                 return None
             
-            return TokenData(email=email)
+            token_data = TokenData(email=email)
+
+            # Never cache a token beyond its own expiry
+            exp = payload.get("exp")
+            ttl = TOKEN_CACHE_TTL if exp is None else min(TOKEN_CACHE_TTL, exp - time.time())
+            _token_cache.set(key, token_data, ttl)
+            return token_data
             
         except JWTError:
             return None
 
+async def _resolve_user(token: str, key: bytes) -> Optional[User]:
+    """Verify a token and load its user, caching the result alongside the token"""
+    auth_service = AuthService()
+    token_data = await auth_service.verify_token(token)
+    if token_data is None:
+        return None
+
+    user = await auth_service.get_user_by_email(token_data.email)
+    if user is not None:
+        _user_cache.set(key, user, _token_cache.remaining(key))
+    return user
+
 # Dependency to get current user
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> User:
     """Get current authenticated user"""
@@ -272,17 +329,24 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     
     try:
         token = credentials.credentials
-        auth_service = AuthService()
-        token_data = await auth_service.verify_token(token)
-        
-        if token_data is None:
-            raise credentials_exception
-        
-        user = await auth_service.get_user_by_email(token_data.email)
+        key = _token_key(token)
+        user = _user_cache.get(key)
+        if user is not None:
+            return user
+
+        pending = _inflight.get(key)
+        if pending is None:
+            pending = asyncio.ensure_future(_resolve_user(token, key))
+            _inflight[key] = pending
+            pending.add_done_callback(lambda _: _inflight.pop(key, None))
+
+        # shield: one cancelled request must not cancel the lookup others await
+        user = await asyncio.shield(pending)
         if user is None:
             raise credentials_exception
         
-        return user
+        # Waiters share one lookup result; give each its own copy
+        return copy.deepcopy(user)
         
     except Exception as e:
         logger.error(f"Get current user failed: {e}")
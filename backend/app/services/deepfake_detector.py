@@ -3,14 +3,22 @@ ScamCap Deepfake Detector - Simplified implementation
 Placeholder for deepfake detection that doesn't require heavy ML dependencies.
 """
 import asyncio
-import hashlib
 import logging
 import os
 from typing import List, Dict, Any, Optional
 from ..config.settings import get_settings
+from ..utils.hashing import hash_bytes, hash_file
 
 logger = logging.getLogger(__name__)
 
+# Static for the life of the process
+_MODEL_INFO = {
+    "model_name": "Simplified Deepfake Detector",
+    "version": "1.0.0",
+    "status": "basic_mode",
+    "note": "Full ML-based detection requires additional dependencies"
+}
+
 
 class DeepfakeDetectionResult:
     def __init__(self):
@@ -97,7 +105,7 @@ class DeepfakeDetector:
         result = DeepfakeDetectionResult()
         
         try:
-            result.content_hash = hashlib.md5(url.encode()).hexdigest()
+            result.content_hash = hash_bytes(url.encode())
             result.is_deepfake = False
             result.risk_score = 0.1
             result.confidence = 0.5
@@ -114,22 +122,13 @@ class DeepfakeDetector:
         return result
 
     async def _calculate_file_hash(self, file_path: str) -> str:
-        """Calculate MD5 hash of a file"""
+        """Calculate the content hash of a file without blocking the event loop"""
         try:
-            hash_md5 = hashlib.md5()
-            with open(file_path, "rb") as f:
-                for chunk in iter(lambda: f.read(4096), b""):
-                    hash_md5.update(chunk)
-            return hash_md5.hexdigest()
+            return await asyncio.to_thread(hash_file, file_path)
         except Exception as e:
             logger.error(f"Hash calculation failed: {e}")
             return ""
 
     async def get_model_info(self) -> Dict[str, Any]:
         """Get information about the deepfake detection"""
-        return {
-            "model_name": "Simplified Deepfake Detector",
-            "version": "1.0.0",
-            "status": "basic_mode",
-            "note": "Full ML-based detection requires additional dependencies"
-        }
+        return _MODEL_INFO
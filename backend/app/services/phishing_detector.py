@@ -3,16 +3,36 @@ ScamCap Phishing Detector - Rule-based implementation
 Analyzes URLs and content for phishing threats using pattern matching and heuristics.
 """
 import asyncio
+import copy
 import re
 import hashlib
 import logging
 import os
+from functools import cached_property, lru_cache
 from typing import Optional, Dict, List, Any
-from urllib.parse import urlparse
+from urllib.parse import urlparse, ParseResult
 from ..config.settings import get_settings
+from ..utils.cache import TTLCache
+
+# Page content is untrusted and can be large: prefer RE2's linear-time engine
+# for scanning it when google-re2 is installed. Only the (?i) inline flag is
+# used with it, since RE2's compile() takes no re-style flags.
+try:
+    import re2 as content_re
+except ImportError:
+    content_re = re
 
 logger = logging.getLogger(__name__)
 
+# Upper bound on analyses in flight for one analyze_batch() call
+BATCH_CONCURRENCY = 50
+
+# Repeat scans of the same input within this window reuse the earlier result
+RESULT_CACHE_TTL = 600.0
+
+# Only the start of a page is scanned; lures sit above the fold
+MAX_CONTENT_SCAN = 128 * 1024
+
 
 class PhishingDetectionResult:
     def __init__(self):
@@ -24,6 +44,15 @@ class PhishingDetectionResult:
         self.analysis_details: Dict[str, Any] = {}
 
 
+def _registrable(host: str) -> str:
+    """Last two labels of a host name (user@mail.google.com:443 -> google.com)"""
+    # Drop any login part and port; a netloc is not a bare host name
+    host = host.rpartition('@')[2]
+    if not host.startswith('['):
+        host = host.partition(':')[0]
+    return '.'.join(host.rstrip('.').rsplit('.', 2)[-2:])
+
+
 class PhishingDetector:
     def __init__(self):
         self.settings = get_settings()
@@ -59,13 +88,61 @@ class PhishingDetector:
             'netflix.com', 'instagram.com', 'youtube.com'
         }
         
-        # Suspicious TLDs
-        self.suspicious_tlds = ['.tk', '.ml', '.ga', '.cf', '.gq', '.xyz', 
-                               '.top', '.club', '.online', '.site', '.buzz']
+        # Suspicious TLDs (a tuple, so one str.endswith call tests them all)
+        self.suspicious_tlds = ('.tk', '.ml', '.ga', '.cf', '.gq', '.xyz', 
+                                '.top', '.club', '.online', '.site', '.buzz')
         
         # URL shorteners
         self.url_shorteners = ['bit.ly', 'tinyurl.com', 'goo.gl', 't.co', 
                               'short.ly', 'ow.ly', 'is.gd', 'buff.ly']
+        
+        # Every legitimate, phishing and shortener domain above is a two-label
+        # registrable name, so each lookup is one set hit on the host's last two labels
+        self._shortener_domains = frozenset(self.url_shorteners)
+        
+        # Compiled once here rather than looked up on every analysis
+        self._ip_re = re.compile(r'\d+\.\d+\.\d+\.\d+')
+        self._numrun_re = re.compile(r'[0-9]{4,}')
+        self._content_patterns = [content_re.compile(f'(?i){p}') for p in self.suspicious_patterns]
+        
+        # One alternation over every content pattern: a single scan rules out
+        # the common no-match case before the per-pattern searches run
+        self._patterns_union = content_re.compile(
+            '(?i)' + '|'.join(f'(?:{p})' for p in self.suspicious_patterns)
+        )
+        
+        # Suspicious content keywords, matched in one pass over lowercased content
+        # (plain words and spaces, so they need no escaping for either engine)
+        self.content_keywords = ['urgent', 'verify', 'suspended', 'click here', 'act now', 
+                                 'limited time', 'password', 'account locked', 'confirm identity']
+        self._content_keywords_re = content_re.compile('|'.join(self.content_keywords))
+        
+        # Phishing keywords looked for inside domain names
+        self._phishing_keywords = frozenset({
+            'secure', 'login', 'verify', 'update', 'account', 
+            'banking', 'support', 'help', 'service', 'suspended',
+            'confirm', 'billing', 'payment', 'alert', 'security'
+        })
+        # Zero-width lookahead so overlapping keywords ("helpayment") both count
+        self._domain_keywords_re = re.compile(
+            '(?=(' + '|'.join(map(re.escape, sorted(self._phishing_keywords))) + '))'
+        )
+        
+        # Character-substitution spoofs of each legitimate domain (g00gle.com,
+        # paypa1.com, ...) mapped back to the domain they imitate
+        common_substitutions = {
+            'o': '0', 'i': '1', 'l': '1', 'e': '3',
+            'a': '@', 's': '$', 'g': '9'
+        }
+        self._spoofed_variants: Dict[str, str] = {}
+        for legit_domain in self.legitimate_domains:
+            for char, substitute in common_substitutions.items():
+                variant = legit_domain.replace(char, substitute)
+                if variant != legit_domain:
+                    self._spoofed_variants.setdefault(variant, legit_domain)
+        
+        # Results of recent analyses, keyed by a digest of the full input
+        self._result_cache = TTLCache(maxsize=10_000, ttl=RESULT_CACHE_TTL, copy=copy.deepcopy)
 
     async def analyze(
         self, 
@@ -77,27 +154,47 @@ class PhishingDetector:
         """
         Analyze URL and content for phishing threats
         """
+        cache_key = self._cache_key(url, content, domain, headers)
+        cached = self._result_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        # Every check is plain CPU work. URL-only scans are quick enough to run
+        # inline; page content can be large, so scan it off the event loop
+        if content:
+            result = await asyncio.to_thread(self._analyze_sync, url, content, domain, headers)
+        else:
+            result = self._analyze_sync(url, content, domain, headers)
+        
+        if 'error' not in result.analysis_details:
+            self._result_cache.set(cache_key, result)
+        return result
+
+    def _analyze_sync(
+        self,
+        url: str,
+        content: Optional[str],
+        domain: Optional[str],
+        headers: Optional[Dict[str, str]]
+    ) -> PhishingDetectionResult:
+        """Run every sub-analysis and combine them into one result (blocking)"""
         result = PhishingDetectionResult()
         
         try:
-            # URL analysis (primary method)
-            url_score = await self._analyze_url(url)
-            result.analysis_details['url_analysis'] = url_score
+            # Parse once; every sub-analysis works from the same ParseResult
+            parsed = urlparse(url)
             
-            # Domain analysis
-            domain_score = await self._analyze_domain(url, domain)
-            result.analysis_details['domain_analysis'] = domain_score
+            # URL (primary method), domain, content and header analyses
+            url_score = self._analyze_url(url, parsed)
+            domain_score = self._analyze_domain(parsed, domain)
+            content_score = self._analyze_content(content) if content else 0.0
+            header_score = self._analyze_headers(headers) if headers else 0.0
             
-            # Content analysis
-            content_score = 0.0
+            result.analysis_details['url_analysis'] = url_score
+            result.analysis_details['domain_analysis'] = domain_score
             if content:
-                content_score = await self._analyze_content(content)
                 result.analysis_details['content_analysis'] = content_score
-            
-            # Header analysis
-            header_score = 0.0
             if headers:
-                header_score = await self._analyze_headers(headers)
                 result.analysis_details['header_analysis'] = header_score
             
             # Calculate overall risk score
@@ -128,7 +225,7 @@ class PhishingDetector:
             
             # Suggest safe alternatives if phishing detected
             if result.is_phishing:
-                result.safe_alternatives = await self._get_safe_alternatives(url)
+                result.safe_alternatives = self._get_safe_alternatives(parsed)
             
             logger.info(f"Phishing analysis completed: {url} - Risk: {result.risk_score:.2f}")
             
@@ -139,71 +236,105 @@ class PhishingDetector:
         
         return result
 
-    async def _analyze_url(self, url: str) -> Dict[str, Any]:
+    @staticmethod
+    def _cache_key(
+        url: str,
+        content: Optional[str],
+        domain: Optional[str],
+        headers: Optional[Dict[str, str]]
+    ) -> bytes:
+        """Fixed-size digest of everything that can change an analysis result"""
+        h = hashlib.blake2b(digest_size=16)
+        for part in (url, content, domain):
+            # Length-prefix each field so different splits can't collide
+            data = (part or '').encode()
+            h.update(len(data).to_bytes(8, 'little'))
+            h.update(data)
+        for name, value in sorted((headers or {}).items()):
+            h.update(f"\0{name}\0{value}".encode())
+        return h.digest()
+
+    async def analyze_batch(self, urls: List[str]) -> List[PhishingDetectionResult]:
+        """
+        Analyze many URLs (URL and domain checks only), in input order.
+        Repeated URLs in the batch are analyzed once and share a result.
+        """
+        semaphore = asyncio.BoundedSemaphore(BATCH_CONCURRENCY)
+        
+        async def analyze_one(url: str) -> PhishingDetectionResult:
+            async with semaphore:
+                return await self.analyze(url)
+        
+        unique_urls = list(dict.fromkeys(urls))
+        results = await asyncio.gather(*(analyze_one(url) for url in unique_urls))
+        by_url = dict(zip(unique_urls, results))
+        return [by_url[url] for url in urls]
+
+    def _url_checks(self, url: str, parsed: ParseResult):
+        """Yield (weight, indicator) for each URL heuristic that fires, cheapest first"""
+        netloc = parsed.netloc
+        
+        # Check for @ symbol (phishing technique)
+        if '@' in url:
+            yield 0.6, "@ symbol in URL (phishing technique)"
+        
+        # Check for no HTTPS
+        if parsed.scheme != 'https':
+            yield 0.2, "No HTTPS encryption"
+        
+        # Check URL length
+        if len(url) > 120:
+            yield 0.2, "Unusually long URL"
+        
+        # Check for very long domain
+        if len(netloc) > 50:
+            yield 0.2, "Unusually long domain name"
+        
+        # Check for excessive subdomains
+        subdomain_count = netloc.count('.')
+        if subdomain_count > 4:
+            yield 0.3, f"Excessive subdomains ({subdomain_count})"
+        
+        # Check for too many hyphens
+        if netloc.count('-') > 3:
+            yield 0.3, "Excessive hyphens in domain"
+        
+        # Check for URL encoding abuse
+        if url.count('%') > 5:
+            yield 0.2, "Excessive URL encoding"
+        
+        # Check for suspicious TLDs - High risk indicator
+        if netloc.endswith(self.suspicious_tlds):
+            # Only on a hit: find which TLD it was for the indicator text
+            tld = next(tld for tld in self.suspicious_tlds if netloc.endswith(tld))
+            yield 0.5, f"High-risk domain extension ({tld})"
+        
+        # Check for URL shorteners
+        if _registrable(netloc.lower()) in self._shortener_domains:
+            yield 0.3, "Uses URL shortener"
+        
+        # Regex checks last: they are the most expensive
+        # Check for IP address instead of domain
+        if self._ip_re.search(netloc):
+            yield 0.5, "Uses IP address instead of domain name"
+        
+        # Check for many numbers in domain
+        if self._numrun_re.search(netloc):
+            yield 0.3, "Suspicious numeric patterns in domain"
+
+    def _analyze_url(self, url: str, parsed: ParseResult) -> Dict[str, Any]:
         """Analyze URL structure for suspicious patterns"""
         try:
-            parsed = urlparse(url)
             score = 0.0
             indicators = []
             
-            # Check for IP address instead of domain
-            if re.search(r'\d+\.\d+\.\d+\.\d+', parsed.netloc):
-                score += 0.5
-                indicators.append("Uses IP address instead of domain name")
-            
-            # Check for very long domain
-            if len(parsed.netloc) > 50:
-                score += 0.2
-                indicators.append("Unusually long domain name")
-            
-            # Check for too many hyphens
-            if parsed.netloc.count('-') > 3:
-                score += 0.3
-                indicators.append("Excessive hyphens in domain")
-            
-            # Check for many numbers in domain
-            if re.search(r'[0-9]{4,}', parsed.netloc):
-                score += 0.3
-                indicators.append("Suspicious numeric patterns in domain")
-            
-            # Check for @ symbol (phishing technique)
-            if '@' in url:
-                score += 0.6
-                indicators.append("@ symbol in URL (phishing technique)")
-            
-            # Check for URL shorteners
-            if any(shortener in parsed.netloc for shortener in self.url_shorteners):
-                score += 0.3
-                indicators.append("Uses URL shortener")
-            
-            # Check for suspicious TLDs - High risk indicator
-            for tld in self.suspicious_tlds:
-                if parsed.netloc.endswith(tld):
-                    score += 0.5
-                    indicators.append(f"High-risk domain extension ({tld})")
+            # Checks are lazy, so once the score is maxed out the rest are skipped
+            for weight, indicator in self._url_checks(url, parsed):
+                score += weight
+                indicators.append(indicator)
+                if score >= 1.0:
                     break
             
-            # Check URL length
-            if len(url) > 120:
-                score += 0.2
-                indicators.append("Unusually long URL")
-            
-            # Check for excessive subdomains
-            subdomain_count = parsed.netloc.count('.')
-            if subdomain_count > 4:
-                score += 0.3
-                indicators.append(f"Excessive subdomains ({subdomain_count})")
-            
-            # Check for URL encoding abuse
-            if url.count('%') > 5:
-                score += 0.2
-                indicators.append("Excessive URL encoding")
-            
-            # Check for no HTTPS
-            if parsed.scheme != 'https':
-                score += 0.2
-                indicators.append("No HTTPS encryption")
-            
             return {
                 'score': min(score, 1.0),
                 'indicators': indicators,
@@ -218,17 +349,16 @@ class PhishingDetector:
             logger.error(f"URL analysis failed: {e}")
             return {'score': 0.5, 'indicators': ['URL analysis failed'], 'details': {}}
 
-    async def _analyze_domain(self, url: str, domain: Optional[str] = None) -> Dict[str, Any]:
+    def _analyze_domain(self, parsed: ParseResult, domain: Optional[str] = None) -> Dict[str, Any]:
         """Analyze domain reputation and legitimacy"""
         try:
-            parsed = urlparse(url)
             domain = domain or parsed.netloc.lower()
             
             score = 0.0
             indicators = []
             
-            # Check against known phishing domains
-            if domain in self.known_phishing_domains:
+            # Check against known phishing domains (and their subdomains)
+            if domain in self.known_phishing_domains or _registrable(domain) in self.known_phishing_domains:
                 score = 1.0
                 indicators.append("Domain is in known phishing list")
                 return {'score': score, 'indicators': indicators, 'details': {'domain': domain}}
@@ -236,33 +366,33 @@ class PhishingDetector:
             # Check for domain spoofing - CRITICAL indicator
             # First, check if this IS a legitimate domain (to avoid false positives)
             clean_domain = domain.replace('www.', '')
-            is_legitimate = False
-            for legit_domain in self.legitimate_domains:
-                if clean_domain == legit_domain or clean_domain.endswith('.' + legit_domain):
-                    is_legitimate = True
-                    break
+            is_legitimate = _registrable(clean_domain) in self.legitimate_domains
             
             # Only check for spoofing if it's NOT a legitimate domain
             if not is_legitimate:
-                for legit_domain in self.legitimate_domains:
-                    legit_name = legit_domain.split('.')[0]  # e.g., 'amazon' from 'amazon.com'
-                    # Check if legitimate brand name is in the domain but it's not the actual domain
-                    if legit_name in domain and legit_domain not in domain:
-                        score += 0.9  # Very high score for brand impersonation
-                        indicators.append(f"⚠️ BRAND IMPERSONATION: Fake {legit_domain} domain!")
-                        break
-                    elif self._is_spoofed_domain(domain, legit_domain):
-                        score += 0.85
-                        indicators.append(f"Domain appears to spoof {legit_domain}")
-                        break
+                # Character-substitution spoofs (g00gle.com) are a single table lookup
+                spoofed = self._spoofed_variants.get(clean_domain.lower())
+                if spoofed:
+                    score += 0.85
+                    indicators.append(f"Domain appears to spoof {spoofed}")
+                else:
+                    for legit_domain in self.legitimate_domains:
+                        legit_name = legit_domain.split('.')[0]  # e.g., 'amazon' from 'amazon.com'
+                        # Check if legitimate brand name is in the domain but it's not the actual domain
+                        if legit_name in domain and legit_domain not in domain:
+                            score += 0.9  # Very high score for brand impersonation
+                            indicators.append(f"⚠️ BRAND IMPERSONATION: Fake {legit_domain} domain!")
+                            break
+                        elif self._is_typosquat(domain, legit_domain):
+                            score += 0.85
+                            indicators.append(f"Domain appears to spoof {legit_domain}")
+                            break
             
             # Only check for suspicious keywords if not a legitimate domain
             if not is_legitimate:
-                # Check for suspicious keywords in domain
-                phishing_keywords = ['secure', 'login', 'verify', 'update', 'account', 
-                                   'banking', 'support', 'help', 'service', 'suspended',
-                                   'confirm', 'billing', 'payment', 'alert', 'security']
-                keyword_count = sum(1 for kw in phishing_keywords if kw in domain)
+                # Check for suspicious keywords in domain (substring match, so
+                # run-together names like "paypalsecure" still count)
+                keyword_count = len(set(self._domain_keywords_re.findall(domain)))
                 if keyword_count >= 3:
                     score += 0.6
                     indicators.append(f"Multiple phishing keywords in domain ({keyword_count} found)")
@@ -288,19 +418,21 @@ class PhishingDetector:
             logger.error(f"Domain analysis failed: {e}")
             return {'score': 0.5, 'indicators': ['Domain analysis failed'], 'details': {}}
 
-    async def _analyze_content(self, content: str) -> float:
+    def _analyze_content(self, content: str) -> float:
         """Analyze page content using pattern matching"""
         try:
             pattern_score = 0.0
             
-            for pattern in self.suspicious_patterns:
-                if re.search(pattern, content, re.IGNORECASE):
-                    pattern_score += 0.2
+            # Window and lowercase once; every scan below reads the same copy
+            text = content[:MAX_CONTENT_SCAN].lower()
+            
+            # Each pattern scores once however often it matches, so count the
+            # distinct patterns, but only when the union says any of them hit
+            if self._patterns_union.search(text):
+                pattern_score = 0.2 * sum(1 for pattern in self._content_patterns if pattern.search(text))
             
-            # Check for suspicious keywords
-            suspicious_keywords = ['urgent', 'verify', 'suspended', 'click here', 'act now', 
-                                   'limited time', 'password', 'account locked', 'confirm identity']
-            keyword_count = sum(1 for keyword in suspicious_keywords if keyword in content.lower())
+            # Check for suspicious keywords (distinct keywords found)
+            keyword_count = len(set(self._content_keywords_re.findall(text)))
             keyword_score = min(keyword_count * 0.15, 0.6)
             
             # Combine scores
@@ -312,7 +444,7 @@ class PhishingDetector:
             logger.error(f"Content analysis failed: {e}")
             return 0.5
 
-    async def _analyze_headers(self, headers: Dict[str, str]) -> float:
+    def _analyze_headers(self, headers: Dict[str, str]) -> float:
         """Analyze HTTP headers for suspicious patterns"""
         try:
             score = 0.0
@@ -328,8 +460,8 @@ class PhishingDetector:
             logger.error(f"Header analysis failed: {e}")
             return 0.0
 
-    def _is_spoofed_domain(self, domain: str, legitimate: str) -> bool:
-        """Check if domain is attempting to spoof a legitimate domain"""
+    def _is_typosquat(self, domain: str, legitimate: str) -> bool:
+        """Check if domain pads a legitimate brand name to imitate it"""
         # Clean up domain (remove www. prefix)
         clean_domain = domain.lower().replace('www.', '')
         clean_legit = legitimate.lower().replace('www.', '')
@@ -342,17 +474,6 @@ class PhishingDetector:
         if clean_domain.endswith('.' + clean_legit) or clean_domain == clean_legit:
             return False
         
-        # Check for character substitution attacks
-        common_substitutions = {
-            'o': '0', 'i': '1', 'l': '1', 'e': '3',
-            'a': '@', 's': '$', 'g': '9'
-        }
-        
-        for char, substitute in common_substitutions.items():
-            spoofed = clean_legit.replace(char, substitute)
-            if clean_domain == spoofed:
-                return True
-        
         # Check for typosquatting (adding/removing characters)
         legit_name = clean_legit.split('.')[0]  # e.g., 'google' from 'google.com'
         domain_name = clean_domain.split('.')[0]
@@ -365,9 +486,8 @@ class PhishingDetector:
         
         return False
 
-    async def _get_safe_alternatives(self, url: str) -> List[str]:
+    def _get_safe_alternatives(self, parsed: ParseResult) -> List[str]:
         """Suggest safe alternatives for suspicious URLs"""
-        parsed = urlparse(url)
         domain = parsed.netloc.lower()
         
         alternatives = []
@@ -388,6 +508,11 @@ class PhishingDetector:
 
     async def get_model_info(self) -> Dict[str, Any]:
         """Get information about the phishing detection"""
+        return self._model_info
+
+    @cached_property
+    def _model_info(self) -> Dict[str, Any]:
+        """Model info never changes for a running process, so build it once"""
         return {
             "model_name": "Rule-Based Phishing Detector",
             "version": "1.0.0",
@@ -399,3 +524,8 @@ class PhishingDetector:
             ],
             "threshold": self.settings.phishing_threshold
         }
+
+@lru_cache(maxsize=1)
+def get_phishing_detector() -> PhishingDetector:
+    """Shared detector, built on first use so cold starts and health checks skip it"""
+    return PhishingDetector()
@@ -1,18 +1,195 @@
 import asyncio
 import hashlib
 import logging
-from datetime import datetime
-from typing import Dict, Any, Optional
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, List, Optional, Tuple
+from urllib.parse import urlparse
+from bson import ObjectId
+from pymongo.write_concern import WriteConcern
 from ..models.schemas import ThreatType, ThreatLogCreate, RiskLevel
 from ..config.database import get_database
-import uuid
+from ..utils.cache import TTLCache
+from ..utils.hashing import HASH_ALGORITHM
 
 logger = logging.getLogger(__name__)
 
+# Log inserts are buffered and written in batches of up to FLUSH_MAX_DOCS,
+# waiting at most FLUSH_INTERVAL seconds after the first queued document
+FLUSH_MAX_DOCS = 500
+FLUSH_INTERVAL = 0.1
+
+# Serverless invocations can be frozen as soon as the response is sent, so a
+# background flush may never run there; write each document directly instead
+BUFFER_LOGS = not os.getenv("VERCEL")
+
+# Threat logs are analytics data: losing a batch in a crash is acceptable, so
+# they are written unacknowledged. Feedback keeps the default write concern.
+_WRITE_CONCERNS = {"threat_logs": WriteConcern(w=0)}
+
+class _LogBuffer:
+    """Queue of (collection, document) pairs drained by a background insert_many task"""
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._queue: Optional[asyncio.Queue] = None
+        self._flusher: Optional[asyncio.Task] = None
+
+    async def add(self, collection: str, doc: Dict[str, Any]):
+        """Queue a document for the next batch (or write it now when buffering is off)"""
+        if not self.enabled:
+            await self._write([(collection, doc)])
+            return
+
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._run())
+        self._queue.put_nowait((collection, doc))
+
+    async def flush(self):
+        """Wait until everything queued so far, including an in-flight batch, is written"""
+        if self._queue is not None:
+            await self._queue.join()
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + FLUSH_INTERVAL
+            while len(batch) < FLUSH_MAX_DOCS:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                await self._write(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _write(self, batch: List[Tuple[str, Dict[str, Any]]]):
+        db = get_database()
+        if db is None:
+            logger.warning(f"Database not available, dropping {len(batch)} log documents")
+            return
+
+        by_collection: Dict[str, List[Dict[str, Any]]] = {}
+        for collection, doc in batch:
+            by_collection.setdefault(collection, []).append(doc)
+
+        for collection, docs in by_collection.items():
+            try:
+                target = db[collection]
+                if collection in _WRITE_CONCERNS:
+                    target = target.with_options(write_concern=_WRITE_CONCERNS[collection])
+                await target.insert_many(docs, ordered=False)
+            except Exception as e:
+                logger.error(f"Failed to write {len(docs)} documents to {collection}: {e}")
+
+# Shared by every ThreatLogger so all routes feed the same batches
+_buffer = _LogBuffer(enabled=BUFFER_LOGS)
+
+# Dashboards poll statistics; serve repeats within this window from memory
+STATS_CACHE_TTL = 30.0
+# Stats documents are flat, so a shallow copy per hit isolates callers
+_stats_cache = TTLCache(maxsize=1024, ttl=STATS_CACHE_TTL, copy=dict)
+
+# Per-analysis fields kept in stored detection_details; bulky sub-"details"
+# (parsed URL parts and the like) are dropped
+_DETAIL_KEYS = ("score", "indicators")
+
+def _compact_details(details: Dict[str, Any]) -> Dict[str, Any]:
+    """Whitelist detection_details down to scalars plus each analysis's score/indicators"""
+    compact = {}
+    for key, value in details.items():
+        if isinstance(value, dict):
+            kept = {k: value[k] for k in _DETAIL_KEYS if k in value}
+            if kept:
+                compact[key] = kept
+        elif value is None or isinstance(value, (bool, int, float, str)):
+            compact[key] = value
+    return compact
+
+def _window_match(user_id: Optional[str], days: int) -> Dict[str, Any]:
+    """$match for the last `days` days, optionally for one user"""
+    # Served by the (user_id, timestamp) / timestamp indexes. Not hinted: a
+    # hint fails the whole query on deployments where they aren't built yet
+    cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+    match_query: Dict[str, Any] = {"timestamp": {"$gte": cutoff}}
+    if user_id:
+        match_query["user_id"] = user_id
+    return match_query
+
+def _stats_stages() -> list:
+    """Stages reducing matched threat logs to one statistics document"""
+    return [
+        {
+            "$group": {
+                "_id": None,
+                "total_threats": {"$sum": 1},
+                "phishing_count": {
+                    "$sum": {"$cond": [{"$eq": ["$threat_type", "phishing"]}, 1, 0]}
+                },
+                "deepfake_count": {
+                    "$sum": {"$cond": [{"$eq": ["$threat_type", "deepfake"]}, 1, 0]}
+                },
+                "high_risk_count": {
+                    "$sum": {"$cond": [{"$gte": ["$risk_score", 0.8]}, 1, 0]}
+                },
+                "avg_risk_score": {"$avg": "$risk_score"},
+                "max_risk_score": {"$max": "$risk_score"}
+            }
+        }
+    ]
+
+def _stats_from(result: list) -> Dict[str, Any]:
+    """Statistics document from the output of _stats_stages() (zeros if nothing matched)"""
+    if result:
+        stats = result[0]
+        del stats["_id"]
+        return stats
+    return {
+        "total_threats": 0,
+        "phishing_count": 0,
+        "deepfake_count": 0,
+        "high_risk_count": 0,
+        "avg_risk_score": 0.0,
+        "max_risk_score": 0.0
+    }
+
+def _top_domain_stages(limit: int) -> list:
+    """Stages ranking domains by number of logged threats"""
+    return [
+        {"$match": {"url": {"$ne": None}}},
+        {
+            "$group": {
+                # domain is stored at insert time; older logs fall back to
+                # the host part of "scheme://host/path"
+                "_id": {"$ifNull": [
+                    "$domain",
+                    {"$arrayElemAt": [{"$split": ["$url", "/"]}, 2]}
+                ]},
+                "threat_count": {"$sum": 1},
+                "avg_risk_score": {"$avg": "$risk_score"},
+                "latest_detection": {"$max": "$timestamp"}
+            }
+        },
+        {"$sort": {"threat_count": -1}},
+        {"$limit": limit}
+    ]
+
 class ThreatLogger:
     def __init__(self):
         pass
 
+    async def flush(self):
+        """Write any buffered log documents immediately"""
+        await _buffer.flush()
+
     async def log_threat(
         self,
         user_id: str,
@@ -34,29 +211,32 @@ class ThreatLogger:
             
             # Determine risk level based on score
             risk_level = self._calculate_risk_level(risk_score)
+            now = datetime.now(timezone.utc)
             
             # Create threat log document
             threat_log = {
-                "_id": str(uuid.uuid4()),
+                "_id": str(ObjectId()),
                 "user_id": user_id,
                 "threat_type": threat_type.value,
                 "risk_score": risk_score,
                 "risk_level": risk_level.value,
                 "url": url,
+                "domain": urlparse(url).netloc.lower() if url else None,
                 "content_hash": content_hash,
-                "detection_details": detection_details or {},
+                "content_hash_alg": HASH_ALGORITHM if content_hash else None,
+                "detection_details": _compact_details(detection_details or {}),
                 "user_action": user_action,
                 "ip_address": ip_address,
                 "user_agent": user_agent,
-                "timestamp": datetime.utcnow(),
-                "logged_at": datetime.utcnow()
+                "timestamp": now,
+                "logged_at": now
             }
             
-            # Insert threat log
-            await db.threat_logs.insert_one(threat_log)
+            # Queue the threat log for the next batched insert
+            await _buffer.add("threat_logs", threat_log)
             
             # Update user threat statistics
-            await self._update_user_stats(user_id, threat_type, risk_score)
+            await self._update_user_stats(user_id, threat_type, risk_score, now)
             
             logger.info(f"Threat logged: {threat_type.value} - Risk: {risk_score} - User: {user_id}")
             
@@ -79,17 +259,18 @@ class ThreatLogger:
                 return
             
             feedback_doc = {
-                "_id": str(uuid.uuid4()),
+                "_id": str(ObjectId()),
                 "user_id": user_id,
                 "feedback_type": feedback_type,  # "false_positive", "false_negative", "suggestion"
                 "feedback": feedback,
                 "url": url,
                 "content_hash": content_hash,
-                "timestamp": datetime.utcnow(),
+                "content_hash_alg": HASH_ALGORITHM if content_hash else None,
+                "timestamp": datetime.now(timezone.utc),
                 "processed": False
             }
             
-            await db.user_feedback.insert_one(feedback_doc)
+            await _buffer.add("user_feedback", feedback_doc)
             
             logger.info(f"Feedback logged: {feedback_type} - User: {user_id}")
             
@@ -100,15 +281,15 @@ class ThreatLogger:
         self,
         user_id: str,
         limit: int = 50,
-        threat_type: Optional[ThreatType] = None
+        threat_type: Optional[ThreatType] = None,
+        include_details: bool = False
     ) -> list:
-        """Get threat history for a user"""
+        """Get threat history for a user (detection_details only if include_details)"""
         try:
             db = get_database()
             if db is None:
                 logger.warning("Database not available, cannot get threat history")
                 return []
-            db = get_database()
             
             # Build query
             query = {"user_id": user_id}
@@ -116,7 +297,8 @@ class ThreatLogger:
                 query["threat_type"] = threat_type.value
             
             # Get threat logs
-            cursor = db.threat_logs.find(query).sort("timestamp", -1).limit(limit)
+            projection = None if include_details else {"detection_details": 0}
+            cursor = db.threat_logs.find(query, projection).sort("timestamp", -1).limit(limit)
             threat_logs = await cursor.to_list(length=limit)
             
             return threat_logs
@@ -131,56 +313,21 @@ class ThreatLogger:
         days: int = 30
     ) -> Dict[str, Any]:
         """Get threat statistics"""
+        cache_key = (user_id or "*", days)
+        cached = _stats_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
         try:
             db = get_database()
             
-            # Build match query
-            match_query = {
-                "timestamp": {
-                    "$gte": datetime.utcnow() - timedelta(days=days)
-                }
-            }
-            
-            if user_id:
-                match_query["user_id"] = user_id
-            
-            # Aggregation pipeline
-            pipeline = [
-                {"$match": match_query},
-                {
-                    "$group": {
-                        "_id": None,
-                        "total_threats": {"$sum": 1},
-                        "phishing_count": {
-                            "$sum": {"$cond": [{"$eq": ["$threat_type", "phishing"]}, 1, 0]}
-                        },
-                        "deepfake_count": {
-                            "$sum": {"$cond": [{"$eq": ["$threat_type", "deepfake"]}, 1, 0]}
-                        },
-                        "high_risk_count": {
-                            "$sum": {"$cond": [{"$gte": ["$risk_score", 0.8]}, 1, 0]}
-                        },
-                        "avg_risk_score": {"$avg": "$risk_score"},
-                        "max_risk_score": {"$max": "$risk_score"}
-                    }
-                }
-            ]
+            pipeline = [{"$match": _window_match(user_id, days)}, *_stats_stages()]
             
             result = await db.threat_logs.aggregate(pipeline).to_list(length=1)
+            stats = _stats_from(result)
             
-            if result:
-                stats = result[0]
-                del stats["_id"]
-                return stats
-            else:
-                return {
-                    "total_threats": 0,
-                    "phishing_count": 0,
-                    "deepfake_count": 0,
-                    "high_risk_count": 0,
-                    "avg_risk_score": 0.0,
-                    "max_risk_score": 0.0
-                }
+            _stats_cache.set(cache_key, stats)
+            return stats
             
         except Exception as e:
             logger.error(f"Failed to get threat statistics: {e}")
@@ -191,20 +338,7 @@ class ThreatLogger:
         try:
             db = get_database()
             
-            pipeline = [
-                {"$match": {"url": {"$ne": None}}},
-                {
-                    "$group": {
-                        "_id": {"$regex": "^https?://([^/]+)", "input": "$url"},
-                        "threat_count": {"$sum": 1},
-                        "avg_risk_score": {"$avg": "$risk_score"},
-                        "latest_detection": {"$max": "$timestamp"}
-                    }
-                },
-                {"$sort": {"threat_count": -1}},
-                {"$limit": limit}
-            ]
-            
+            pipeline = _top_domain_stages(limit)
             domains = await db.threat_logs.aggregate(pipeline).to_list(length=limit)
             return domains
             
@@ -212,6 +346,38 @@ class ThreatLogger:
             logger.error(f"Failed to get top threat domains: {e}")
             return []
 
+    async def get_dashboard(
+        self,
+        user_id: Optional[str] = None,
+        days: int = 30,
+        limit: int = 10
+    ) -> Dict[str, Any]:
+        """Threat statistics and top domains for one time window, in a single index scan"""
+        try:
+            db = get_database()
+            
+            pipeline = [
+                {"$match": _window_match(user_id, days)},
+                {"$facet": {
+                    "stats": _stats_stages(),
+                    "top_domains": _top_domain_stages(limit)
+                }}
+            ]
+            
+            result = await db.threat_logs.aggregate(
+                pipeline, allowDiskUse=False
+            ).to_list(length=1)
+            facets = result[0] if result else {}
+            
+            return {
+                "stats": _stats_from(facets.get("stats", [])),
+                "top_domains": facets.get("top_domains", [])
+            }
+            
+        except Exception as e:
+            logger.error(f"Failed to get threat dashboard: {e}")
+            return {"stats": _stats_from([]), "top_domains": []}
+
     def _calculate_risk_level(self, risk_score: float) -> RiskLevel:
         """Calculate risk level from risk score"""
         if risk_score >= 0.8:
@@ -223,15 +389,14 @@ class ThreatLogger:
         else:
             return RiskLevel.LOW
 
-    async def _update_user_stats(self, user_id: str, threat_type: ThreatType, risk_score: float):
+    async def _update_user_stats(self, user_id: str, threat_type: ThreatType, risk_score: float, now: datetime):
         """Update user threat statistics"""
         try:
-            from bson import ObjectId
             db = get_database()
             
             # Update user document with latest threat info
             update_data = {
-                "last_threat_detected": datetime.utcnow(),
+                "last_threat_detected": now,
                 f"total_{threat_type.value}_detected": 1
             }
             
@@ -242,7 +407,7 @@ class ThreatLogger:
                 {"_id": ObjectId(user_id)},
                 {
                     "$inc": update_data,
-                    "$set": {"updated_at": datetime.utcnow()}
+                    "$set": {"updated_at": now}
                 }
             )
             
@@ -282,7 +447,7 @@ class ThreatLogger:
             return {
                 "total_records": len(threat_logs),
                 "export_format": format,
-                "exported_at": datetime.utcnow().isoformat(),
+                "exported_at": datetime.now(timezone.utc).isoformat(),
                 "data": threat_logs
             }
             
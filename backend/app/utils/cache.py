@@ -0,0 +1,66 @@
+"""
+Small in-process TTL cache used to skip repeated work on hot request paths.
+"""
+import time
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+class TTLCache:
+    """Bounded dict cache whose entries expire after a per-entry TTL.
+
+    Pass `copy` (e.g. copy.deepcopy) when cached values are mutable: it is
+    applied on set and on every hit, so no caller can change what others see.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0, copy: Optional[Callable[[Any], Any]] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.copy = copy
+        self._data: Dict[Hashable, Tuple[float, Any]] = {}
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.get(key)
+        if entry is None:
+            return default
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            self._data.pop(key, None)
+            return default
+        return value if self.copy is None else self.copy(value)
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0:
+            return
+        if key not in self._data and len(self._data) >= self.maxsize:
+            self._evict()
+        if self.copy is not None:
+            value = self.copy(value)
+        self._data[key] = (time.monotonic() + ttl, value)
+
+    def remaining(self, key: Hashable) -> float:
+        """Seconds until the entry for key expires (0.0 if missing or expired)"""
+        entry = self._data.get(key)
+        if entry is None:
+            return 0.0
+        return max(entry[0] - time.monotonic(), 0.0)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def _evict(self) -> None:
+        """Drop the oldest insertion plus any expired entries queued behind it"""
+        now = time.monotonic()
+        del self._data[next(iter(self._data))]
+        while self._data:
+            key = next(iter(self._data))
+            if self._data[key][0] > now:
+                break
+            del self._data[key]
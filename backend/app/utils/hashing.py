@@ -0,0 +1,47 @@
+"""
+Content hashing for detection results and threat logs.
+
+Uses BLAKE3 (SIMD-accelerated) when the blake3 wheel is installed and falls
+back to hashlib's BLAKE2b otherwise. Both give 16-byte / 32-char hex digests.
+"""
+import hashlib
+
+try:
+    from blake3 import blake3 as _blake3
+except ImportError:
+    _blake3 = None
+
+DIGEST_SIZE = 16
+HASH_ALGORITHM = "blake3" if _blake3 is not None else "blake2b"
+
+_CHUNK_SIZE = 1 << 20
+
+
+def _new_hasher():
+    if _blake3 is not None:
+        return _blake3()
+    return hashlib.blake2b(digest_size=DIGEST_SIZE)
+
+
+def _hexdigest(hasher) -> str:
+    if _blake3 is not None:
+        return hasher.hexdigest(length=DIGEST_SIZE)
+    return hasher.hexdigest()
+
+
+def hash_bytes(data: bytes) -> str:
+    """Hex content hash of an in-memory buffer"""
+    hasher = _new_hasher()
+    hasher.update(data)
+    return _hexdigest(hasher)
+
+
+def hash_file(file_path: str) -> str:
+    """Hex content hash of a file, read in 1 MiB chunks (blocking)"""
+    with open(file_path, "rb") as f:
+        if _blake3 is None and hasattr(hashlib, "file_digest"):
+            return hashlib.file_digest(f, _new_hasher).hexdigest()
+        hasher = _new_hasher()
+        for chunk in iter(lambda: f.read(_CHUNK_SIZE), b""):
+            hasher.update(chunk)
+        return _hexdigest(hasher)
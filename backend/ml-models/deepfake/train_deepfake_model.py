@@ -4,15 +4,22 @@ Uses EfficientNet-B4 CNN for image/video deepfake detection
 """
 
 import os
+import contextlib
+from functools import partial
 import numpy as np
 import pandas as pd
 import cv2
 import torch
 import torch.nn as nn
 import torch.optim as optim
-from torch.utils.data import Dataset, DataLoader, WeightedRandomSampler
+import torch.distributed as dist
+from torch.nn.parallel import DistributedDataParallel as DDP
+from torch.utils.checkpoint import checkpoint
+from torch.utils.data import Dataset, DataLoader, WeightedRandomSampler, DistributedSampler
+import torch.nn.functional as F
 from torchvision import transforms, models
-from PIL import Image
+from torchvision.io import ImageReadMode, decode_image, decode_jpeg, read_file
+from torchvision.transforms import functional as TF
 import albumentations as A
 from albumentations.pytorch import ToTensorV2
 from sklearn.model_selection import train_test_split
@@ -22,19 +29,45 @@ import seaborn as sns
 from tqdm import tqdm
 import logging
 import json
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
 import warnings
 warnings.filterwarnings('ignore')
 
+# Optional: batched GPU face detection and augmentation
+try:
+    from facenet_pytorch import MTCNN
+except ImportError:
+    MTCNN = None
+
+try:
+    import kornia.augmentation as K
+except ImportError:
+    K = None
+
+# Optional: on-disk cache of extracted faces
+try:
+    import lmdb
+except ImportError:
+    lmdb = None
+
+IMAGENET_MEAN = [0.485, 0.456, 0.406]
+IMAGENET_STD = [0.229, 0.224, 0.225]
+
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class DeepfakeDataset(Dataset):
-    def __init__(self, image_paths, labels, transform=None, face_detector=None):
+    def __init__(self, image_paths, labels, transform=None, face_detector=None, cache_path=None,
+                 cache_prefix=''):
         self.image_paths = image_paths
         self.labels = labels
         self.transform = transform
         self.face_detector = face_detector
+        self.cache_path = cache_path
+        self.cache_prefix = cache_prefix
+        self._cache_env = None
 
     def __len__(self):
         return len(self.image_paths)
@@ -43,60 +76,255 @@ class DeepfakeDataset(Dataset):
         image_path = self.image_paths[idx]
         label = self.labels[idx]
 
-        # Load image
-        try:
-            image = cv2.imread(image_path)
-            image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-            
-            # Extract face if detector is provided
-            if self.face_detector is not None:
-                faces = self.extract_faces(image)
-                if len(faces) > 0:
-                    # Use the largest face
-                    face = max(faces, key=lambda x: x.shape[0] * x.shape[1])
-                    image = face
-            
-            # Convert to PIL Image
-            image = Image.fromarray(image)
-            
-            # Apply transforms
-            if self.transform:
-                image = self.transform(image)
-            
-            return image, torch.tensor(label, dtype=torch.long)
-            
-        except Exception as e:
-            logger.warning(f"Error loading image {image_path}: {e}")
-            # Return dummy data in case of error
-            dummy_image = torch.zeros((3, 224, 224))
-            return dummy_image, torch.tensor(label, dtype=torch.long)
+        # Load image (unreadable files were dropped in load_data, so errors here are real)
+        image = self.load_cached_face(image_path) if self.cache_path else None
+        if image is None:
+            image = self.load_face(image_path)
+        
+        # Apply transforms (Albumentations works on the NumPy array directly)
+        if self.transform:
+            image = self.transform(image=image)['image']
+        
+        return image, torch.tensor(label, dtype=torch.long)
+
+    def load_face(self, image_path):
+        """Decode an image and crop its largest face (whole image if none)"""
+        image = cv2.imread(image_path)
+        
+        # Extract face if detector is provided (detectors take OpenCV's BGR)
+        if self.face_detector is not None:
+            faces = self.extract_faces(image)
+            if len(faces) > 0:
+                image = faces[0]
+        
+        # Only the crop needs converting
+        return cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+
+    def load_cached_face(self, image_path):
+        """Face crop from the LMDB cache, or None if it isn't cached"""
+        # Opened on first use so each DataLoader worker gets its own handle
+        if self._cache_env is None:
+            self._cache_env = lmdb.open(
+                self.cache_path, readonly=True, lock=False, readahead=False, meminit=False
+            )
+        
+        with self._cache_env.begin(buffers=True) as txn:
+            value = txn.get(face_cache_key(self.cache_prefix, image_path))
+            if value is None:
+                return None
+            return decode_cached_face(value)
 
     def extract_faces(self, image):
-        """Extract faces from image using OpenCV"""
+        """Extract the largest face from a BGR image using OpenCV (empty list if none)"""
         try:
-            gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
-            faces = self.face_detector.detectMultiScale(
-                gray, scaleFactor=1.1, minNeighbors=5, minSize=(30, 30)
-            )
+            if isinstance(self.face_detector, cv2.CascadeClassifier):
+                gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+                faces = np.asarray(self.face_detector.detectMultiScale(
+                    gray, scaleFactor=1.1, minNeighbors=5, minSize=(30, 30)
+                ))
+            else:
+                # YuNet: Nx15 rows of x, y, w, h, landmarks, score
+                self.face_detector.setInputSize((image.shape[1], image.shape[0]))
+                _, faces = self.face_detector.detect(image)
+                if faces is None:
+                    return []
+                faces = faces[:, :4].astype(np.int32)
+                faces[:, :2] = np.maximum(faces[:, :2], 0)
             
-            face_images = []
-            for (x, y, w, h) in faces:
-                face = image[y:y+h, x:x+w]
-                if face.shape[0] > 50 and face.shape[1] > 50:  # Filter small faces
-                    face_images.append(face)
+            if faces.size == 0:
+                return []
             
-            return face_images
+            # Largest face above 50px on both sides, picked without per-box crops
+            keep = (faces[:, 2] > 50) & (faces[:, 3] > 50)
+            if not keep.any():
+                return []
+            areas = np.where(keep, faces[:, 2] * faces[:, 3], -1)
+            x, y, w, h = faces[np.argmax(areas)]
+            
+            return [image[y:y+h, x:x+w]]
             
         except Exception as e:
             logger.warning(f"Face extraction failed: {e}")
             return []
 
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+def scan_images(directory, label):
+    """Yield (path, label) for every image file directly inside directory"""
+    if not os.path.isdir(directory):
+        return
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                yield entry.path, label
+
+def is_readable_image(image_path):
+    """Whether OpenCV can decode the file (checked at 1/8 scale)"""
+    return cv2.imread(image_path, cv2.IMREAD_REDUCED_COLOR_8) is not None
+
+def class_counts(labels):
+    """[real, fake] counts in one pass"""
+    return np.bincount(labels, minlength=2)
+
+def face_cache_key(prefix, image_path):
+    """LMDB key for a face crop; the prefix names the detector and crop size that made it"""
+    return (prefix + image_path).encode()
+
+def encode_cached_face(face):
+    """uint8 HWC array -> shape header + raw bytes"""
+    return np.asarray(face.shape, dtype=np.uint32).tobytes() + np.ascontiguousarray(face).tobytes()
+
+def decode_cached_face(value):
+    """Inverse of encode_cached_face (copies out of the LMDB buffer)"""
+    shape = np.frombuffer(value, dtype=np.uint32, count=3)
+    return np.frombuffer(value, dtype=np.uint8, offset=12).reshape(shape).copy()
+
+class EncodedImageDataset(Dataset):
+    """Undecoded images for GPU decoding and face extraction"""
+
+    def __init__(self, image_paths, labels):
+        self.image_paths = image_paths
+        self.labels = labels
+
+    def __len__(self):
+        return len(self.image_paths)
+
+    def __getitem__(self, idx):
+        image_path = self.image_paths[idx]
+        data = read_file(image_path)
+
+        # JPEGs stay encoded for nvJPEG; anything else is decoded here to uint8 CHW
+        if not image_path.lower().endswith(('.jpg', '.jpeg')):
+            data = decode_image(data, mode=ImageReadMode.RGB)
+
+        return data, torch.tensor(self.labels[idx], dtype=torch.long)
+
+def collate_encoded(batch):
+    """Keep variable-size images as a list; only the labels are stacked"""
+    images, labels = zip(*batch)
+    return list(images), torch.stack(labels)
+
+class GPUFacePreprocessor:
+    """Decode, detect, crop and normalize faces for a whole batch on the GPU"""
+
+    def __init__(self, img_size, device, detect_size=640, min_face=50):
+        self.img_size = img_size
+        self.device = device
+        self.detect_size = detect_size
+        self.min_face = min_face
+        self.detector = MTCNN(keep_all=True, device=device)
+
+        mean = torch.tensor(IMAGENET_MEAN, device=device)
+        std = torch.tensor(IMAGENET_STD, device=device)
+        cutout = int(img_size * 0.1) ** 2 / img_size ** 2
+
+        # Batched equivalent of the Albumentations training pipeline
+        self.augment = K.AugmentationSequential(
+            K.RandomHorizontalFlip(p=0.5),
+            K.ColorJitter(brightness=0.2, contrast=0.2, saturation=0.2, hue=0.05, p=0.3),
+            K.RandomGaussianNoise(std=0.03, p=0.1),
+            K.RandomGaussianBlur((5, 5), (0.1, 2.0), p=0.1),
+            K.RandomMotionBlur(5, 35.0, 0.5, p=0.1),
+            K.RandomSharpness(0.5, p=0.1),
+            K.RandomGamma((0.8, 1.2), p=0.1),
+            K.RandomErasing(scale=(cutout / 4, cutout), ratio=(0.5, 2.0), p=0.3),
+            K.Normalize(mean=mean, std=std),
+            data_keys=["input"]
+        ).to(device)
+        self.normalize = K.Normalize(mean=mean, std=std).to(device)
+
+    def decode(self, encoded):
+        """Encoded JPEGs / CPU-decoded images -> list of uint8 CHW tensors on the device"""
+        images = list(encoded)
+        jpegs = [i for i, data in enumerate(images) if data.dim() == 1]
+        if jpegs:
+            # One batched nvJPEG call for every JPEG in the batch
+            decoded = decode_jpeg(
+                [images[i] for i in jpegs], mode=ImageReadMode.RGB, device=self.device
+            )
+            for i, image in zip(jpegs, decoded):
+                images[i] = image
+        return [image.to(self.device, non_blocking=True) for image in images]
+
+    def largest_boxes(self, images):
+        """Largest face box per image in its own pixel coordinates (None if no usable face)"""
+        # Detect on one fixed-size batch (the detector expects float NHWC in 0-255)
+        detect = torch.cat([
+            F.interpolate(image[None].float(), size=(self.detect_size, self.detect_size),
+                          mode='bilinear', antialias=True)
+            for image in images
+        ])
+        batch_boxes, _ = self.detector.detect(detect.permute(0, 2, 3, 1))
+
+        largest = []
+        for image, boxes in zip(images, batch_boxes):
+            if boxes is None:
+                largest.append(None)
+                continue
+            height, width = image.shape[-2:]
+            boxes = boxes * np.array([width, height, width, height]) / self.detect_size
+            sizes = boxes[:, 2:] - boxes[:, :2]
+            sizes[(sizes <= self.min_face).any(axis=1)] = 0
+            best = int(np.argmax(sizes[:, 0] * sizes[:, 1]))
+            largest.append(boxes[best] if sizes[best].all() else None)
+        return largest
+
+    def __call__(self, encoded, train=False):
+        """Batch from collate_encoded -> normalized NCHW face crops on the device"""
+        images = self.decode(encoded)
+        boxes = self.largest_boxes(images)
+
+        # Crop from the full-resolution decode, not the downscaled detection input
+        faces = []
+        for image, box in zip(images, boxes):
+            height, width = image.shape[-2:]
+            if box is None:
+                # No face: fall back to the whole frame, like the CPU path
+                top, left, h, w = 0, 0, height, width
+            else:
+                x1, y1 = max(int(box[0]), 0), max(int(box[1]), 0)
+                x2, y2 = min(int(box[2]), width), min(int(box[3]), height)
+                top, left, h, w = y1, x1, y2 - y1, x2 - x1
+            face = TF.resized_crop(image.float(), top, left, h, w, [self.img_size, self.img_size], antialias=True)
+            faces.append(face)
+        faces = torch.stack(faces).div_(255)
+
+        return self.augment(faces) if train else self.normalize(faces)
+
+@contextlib.contextmanager
+def frozen_bn_stats(module):
+    """Run the module's forward without touching its BatchNorm running statistics"""
+    bns = [m for m in module.modules()
+           if isinstance(m, nn.modules.batchnorm._BatchNorm) and m.track_running_stats]
+    saved = [(bn.momentum, bn.num_batches_tracked.clone()) for bn in bns]
+    for bn in bns:
+        bn.momentum = 0.0
+    try:
+        yield
+    finally:
+        for bn, (momentum, tracked) in zip(bns, saved):
+            bn.momentum = momentum
+            bn.num_batches_tracked.copy_(tracked)
+
+def recompute_contexts(module):
+    """Checkpoint contexts: the original forward updates BN statistics, the recompute does not"""
+    return contextlib.nullcontext(), frozen_bn_stats(module)
+
 class EfficientNetDeepfake(nn.Module):
-    def __init__(self, model_name='efficientnet_b4', num_classes=2, dropout=0.5):
+    def __init__(self, model_name='efficientnet_b4', num_classes=2, dropout=0.5, checkpoint_segments=4,
+                 frozen_blocks=5):
         super(EfficientNetDeepfake, self).__init__()
         
+        # Backbone activations are recomputed in backward, segment by segment
+        self.checkpoint_segments = checkpoint_segments
+        
         # Load pre-trained EfficientNet
-        self.backbone = models.efficientnet_b4(pretrained=True)
+        self.backbone = models.efficientnet_b4(weights=models.EfficientNet_B4_Weights.IMAGENET1K_V1)
+        
+        # Freeze the early, generic blocks: no gradients, and BN keeps its ImageNet statistics
+        self.frozen_blocks = frozen_blocks
+        for block in self.backbone.features[:frozen_blocks]:
+            block.requires_grad_(False)
         
         # Replace classifier
         in_features = self.backbone.classifier[1].in_features
@@ -120,32 +348,136 @@ class EfficientNetDeepfake(nn.Module):
             nn.Sigmoid()
         )
 
+    def train(self, mode=True):
+        """Switch modes, keeping the frozen blocks (and their BN layers) in eval"""
+        super().train(mode)
+        self.backbone.features[:self.frozen_blocks].eval()
+        return self
+
     def forward(self, x):
-        # Extract features
-        features = self.backbone.features(x)
-        
-        # Apply attention
-        attention_weights = self.attention(features)
-        features = features * attention_weights
+        # Frozen blocks never need a backward graph
+        features = self.backbone.features
+        if self.frozen_blocks:
+            with torch.no_grad():
+                x = features[:self.frozen_blocks](x)
+            features = features[self.frozen_blocks:]
+        
+        # Extract features (checkpointed while training to halve activation memory).
+        # The recompute in backward runs the blocks in train mode a second time, so
+        # it is done under frozen_bn_stats to keep BN running statistics updated once per step
+        if self.training and self.checkpoint_segments and torch.is_grad_enabled():
+            blocks = list(features)
+            size = -(-len(blocks) // self.checkpoint_segments)
+            for start in range(0, len(blocks), size):
+                segment = nn.Sequential(*blocks[start:start + size])
+                x = checkpoint(segment, x, use_reentrant=False,
+                               context_fn=partial(recompute_contexts, segment))
+            features = x
+        else:
+            features = features(x)
         
-        # Global average pooling and classification
+        # Global average pooling, then channel attention on the pooled vector.
+        # The weights are constant over H and W, so avgpool(f * w) == avgpool(f) * w
+        # and the full-size feature map is never rescaled or re-read
         x = self.backbone.avgpool(features)
+        x = x * self.attention(x)
         x = torch.flatten(x, 1)
         x = self.backbone.classifier(x)
         
         return x
 
+class CUDAPrefetcher:
+    """Prepares the next batch on a side CUDA stream while the current one trains"""
+
+    def __init__(self, loader, prepare):
+        self.loader = loader
+        self.prepare = prepare
+        self.stream = torch.cuda.Stream()
+
+    def __len__(self):
+        return len(self.loader)
+
+    def __iter__(self):
+        batches = iter(self.loader)
+        next_batch = self.preload(batches)
+        while next_batch is not None:
+            current = torch.cuda.current_stream()
+            current.wait_stream(self.stream)
+            # Tensors allocated on the side stream are now also used on this one
+            for tensor in next_batch:
+                tensor.record_stream(current)
+            batch = next_batch
+            next_batch = self.preload(batches)
+            yield batch
+
+    def preload(self, batches):
+        try:
+            images, labels = next(batches)
+        except StopIteration:
+            return None
+        with torch.cuda.stream(self.stream):
+            return self.prepare(images, labels)
+
+def unwrap_model(model):
+    """The plain nn.Module behind torch.compile / DistributedDataParallel wrappers"""
+    model = getattr(model, '_orig_mod', model)
+    return model.module if isinstance(model, DDP) else model
+
+def half_state_dict(model):
+    """State dict with floating-point tensors stored as fp16 (half the size on disk)"""
+    return {
+        name: tensor.half() if tensor.is_floating_point() else tensor
+        for name, tensor in model.state_dict().items()
+    }
+
 class DeepfakeModelTrainer:
-    def __init__(self, model_name='efficientnet_b4', img_size=224, batch_size=32):
+    def __init__(self, model_name='efficientnet_b4', img_size=224, batch_size=64, gpu_faces=True,
+                 face_cache=None, yunet_model='face_detection_yunet_2023mar.onnx'):
         self.model_name = model_name
         self.img_size = img_size
         self.batch_size = batch_size
-        self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+        self.face_cache = face_cache if lmdb is not None else None
+        if face_cache and lmdb is None:
+            logger.warning("lmdb not installed, face crops will not be cached")
+        # Under torchrun, main() has initialized the process group and picked this rank's GPU
+        self.distributed = dist.is_available() and dist.is_initialized()
+        self.rank = dist.get_rank() if self.distributed else 0
+        self.is_main = self.rank == 0
+        self.device = torch.device('cuda', torch.cuda.current_device()) if torch.cuda.is_available() else torch.device('cpu')
+        
+        # Class-balancing loss weights, only used when the weighted sampler can't be
+        self.loss_weights = None
+        
+        # Input shapes are fixed, so let cuDNN benchmark and keep the fastest conv kernels
+        if self.device.type == 'cuda':
+            torch.backends.cudnn.benchmark = True
+        
+        # Mixed precision on CUDA: bf16 where supported (no loss scaling needed), fp16 otherwise
+        self.use_amp = self.device.type == 'cuda'
+        self.amp_dtype = torch.bfloat16 if self.use_amp and torch.cuda.is_bf16_supported() else torch.float16
+        
+        # Batched face extraction and augmentation on the GPU when possible;
+        # Haar + Albumentations on CPU workers otherwise
+        self.gpu_preprocessor = None
+        if gpu_faces and MTCNN is not None and K is not None and self.device.type == 'cuda':
+            self.gpu_preprocessor = GPUFacePreprocessor(img_size, self.device)
+        elif gpu_faces:
+            logger.warning("GPU preprocessing unavailable (needs CUDA, facenet-pytorch and kornia), using OpenCV")
+        
+        # Initialize face detector: YuNet CNN if its model is available, Haar otherwise
+        if yunet_model and os.path.exists(yunet_model) and hasattr(cv2, 'FaceDetectorYN'):
+            self.face_detector = cv2.FaceDetectorYN.create(yunet_model, '', (320, 320), 0.9, 0.3, 5000)
+            detector_name = 'yunet'
+        else:
+            if yunet_model:
+                logger.warning(f"YuNet model {yunet_model} unavailable, falling back to the Haar cascade")
+            self.face_detector = cv2.CascadeClassifier(
+                cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
+            )
+            detector_name = 'haar'
         
-        # Initialize face detector
-        self.face_detector = cv2.CascadeClassifier(
-            cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
-        )
+        # Cached crops are only valid for the detector and size that produced them
+        self.face_cache_prefix = f"{detector_name}/{img_size}/"
         
         # Model will be initialized in train method
         self.model = None
@@ -174,54 +506,76 @@ class DeepfakeModelTrainer:
                 ], p=0.3),
                 A.Cutout(max_h_size=int(self.img_size * 0.1), 
                         max_w_size=int(self.img_size * 0.1), p=0.3),
-                A.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225]),
+                A.Normalize(mean=IMAGENET_MEAN, std=IMAGENET_STD),
                 ToTensorV2(),
             ])
         else:
             # Validation transforms
             return A.Compose([
                 A.Resize(self.img_size, self.img_size),
-                A.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225]),
+                A.Normalize(mean=IMAGENET_MEAN, std=IMAGENET_STD),
                 ToTensorV2(),
             ])
 
+    def build_face_cache(self, image_paths):
+        """Decode, detect and resize every image once into the LMDB face cache"""
+        loader = DeepfakeDataset(image_paths, None, face_detector=self.face_detector)
+        face_bytes = self.img_size * self.img_size * 3 + 12
+        
+        # map_size is only an upper bound; the file grows as entries are written
+        env = lmdb.open(self.face_cache, map_size=max(1 << 30, 2 * face_bytes * len(image_paths)))
+        try:
+            with env.begin() as txn:
+                missing = [path for path in image_paths
+                           if txn.get(face_cache_key(self.face_cache_prefix, path)) is None]
+            if not missing:
+                return
+            
+            logger.info(f"Caching {len(missing)} face crops in {self.face_cache}")
+            for start in range(0, len(missing), 1000):
+                with env.begin(write=True) as txn:
+                    for path in tqdm(missing[start:start + 1000], desc="Caching faces", leave=False):
+                        try:
+                            face = loader.load_face(path)
+                        except Exception as e:
+                            logger.warning(f"Error loading image {path}: {e}")
+                            continue
+                        face = cv2.resize(face, (self.img_size, self.img_size), interpolation=cv2.INTER_AREA)
+                        txn.put(face_cache_key(self.face_cache_prefix, path), encode_cached_face(face))
+        finally:
+            env.close()
+
     def load_data(self, data_dir):
         """Load deepfake dataset"""
         logger.info(f"Loading data from {data_dir}")
         
-        image_paths = []
-        labels = []
-        
-        # Expected structure: data_dir/real/, data_dir/fake/
-        real_dir = os.path.join(data_dir, 'real')
-        fake_dir = os.path.join(data_dir, 'fake')
-        
-        # Load real images (label 0)
-        if os.path.exists(real_dir):
-            for img_file in os.listdir(real_dir):
-                if img_file.lower().endswith(('.jpg', '.jpeg', '.png')):
-                    image_paths.append(os.path.join(real_dir, img_file))
-                    labels.append(0)
-        
-        # Load fake images (label 1)
-        if os.path.exists(fake_dir):
-            for img_file in os.listdir(fake_dir):
-                if img_file.lower().endswith(('.jpg', '.jpeg', '.png')):
-                    image_paths.append(os.path.join(fake_dir, img_file))
-                    labels.append(1)
-        
-        # Convert to numpy arrays
-        image_paths = np.array(image_paths)
-        labels = np.array(labels)
-        
-        # Shuffle data
-        indices = np.random.permutation(len(image_paths))
+        # Expected structure: data_dir/real/ (label 0), data_dir/fake/ (label 1)
+        entries = list(chain(
+            scan_images(os.path.join(data_dir, 'real'), 0),
+            scan_images(os.path.join(data_dir, 'fake'), 1)
+        ))
+        
+        # Drop unreadable images up front rather than training on placeholders
+        # (1/8-scale decode: enough to prove the file is intact, much cheaper)
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            readable = list(executor.map(is_readable_image, (path for path, _ in entries)))
+        if not all(readable):
+            logger.warning(f"Skipping {readable.count(False)} unreadable images")
+            entries = [entry for entry, ok in zip(entries, readable) if ok]
+        
+        image_paths = np.array([path for path, _ in entries])
+        labels = np.fromiter((label for _, label in entries), dtype=np.int8, count=len(entries))
+        
+        # Shuffle data (seeded, so runs see the same order)
+        indices = np.arange(len(image_paths))
+        np.random.default_rng(42).shuffle(indices)
         image_paths = image_paths[indices]
         labels = labels[indices]
         
+        real_count, fake_count = class_counts(labels)
         logger.info(f"Total images: {len(image_paths)}")
-        logger.info(f"Real images: {sum(labels == 0)}")
-        logger.info(f"Fake images: {sum(labels == 1)}")
+        logger.info(f"Real images: {real_count}")
+        logger.info(f"Fake images: {fake_count}")
         
         return image_paths, labels
 
@@ -237,59 +591,81 @@ class DeepfakeModelTrainer:
             X_train, y_train, test_size=val_size, random_state=42, stratify=y_train
         )
         
-        # Create transforms
-        train_transform = self.get_transforms(train=True)
-        val_transform = self.get_transforms(train=False)
-        
         # Create datasets
-        train_dataset = DeepfakeDataset(
-            X_train, y_train, 
-            transform=train_transform, 
-            face_detector=self.face_detector
-        )
-        val_dataset = DeepfakeDataset(
-            X_val, y_val, 
-            transform=val_transform, 
-            face_detector=self.face_detector
-        )
-        test_dataset = DeepfakeDataset(
-            X_test, y_test, 
-            transform=val_transform, 
-            face_detector=self.face_detector
-        )
+        if self.gpu_preprocessor is not None:
+            # Workers only read files; decoding, detection, cropping and
+            # augmentation run per batch on the GPU
+            train_dataset = EncodedImageDataset(X_train, y_train)
+            val_dataset = EncodedImageDataset(X_val, y_val)
+            test_dataset = EncodedImageDataset(X_test, y_test)
+        else:
+            # Faces don't change between epochs: detect them once, then read crops from LMDB
+            if self.face_cache:
+                if self.is_main:
+                    self.build_face_cache(list(image_paths))
+                if self.distributed:
+                    dist.barrier()
+            
+            # Create transforms
+            train_transform = self.get_transforms(train=True)
+            val_transform = self.get_transforms(train=False)
+            
+            train_dataset = DeepfakeDataset(
+                X_train, y_train, 
+                transform=train_transform, 
+                face_detector=self.face_detector,
+                cache_path=self.face_cache,
+                cache_prefix=self.face_cache_prefix
+            )
+            val_dataset = DeepfakeDataset(
+                X_val, y_val, 
+                transform=val_transform, 
+                face_detector=self.face_detector,
+                cache_path=self.face_cache,
+                cache_prefix=self.face_cache_prefix
+            )
+            test_dataset = DeepfakeDataset(
+                X_test, y_test, 
+                transform=val_transform, 
+                face_detector=self.face_detector,
+                cache_path=self.face_cache,
+                cache_prefix=self.face_cache_prefix
+            )
         
         # Create weighted sampler for balanced training
-        class_counts = np.bincount(y_train)
-        class_weights = 1.0 / class_counts
-        sample_weights = class_weights[y_train]
-        sampler = WeightedRandomSampler(
-            weights=sample_weights, 
-            num_samples=len(sample_weights), 
-            replacement=True
-        )
+        class_weights = 1.0 / class_counts(y_train)
+        if self.distributed:
+            # Each rank trains on its own shard; balance through the loss instead
+            sampler = DistributedSampler(train_dataset, shuffle=True, seed=42, drop_last=True)
+            self.loss_weights = torch.as_tensor(
+                class_weights / class_weights.sum() * len(class_weights), dtype=torch.float32, device=self.device
+            )
+        else:
+            # float32 tensor up front so the sampler doesn't convert a float64 array
+            sample_weights = torch.as_tensor(class_weights[y_train], dtype=torch.float32)
+            sampler = WeightedRandomSampler(
+                weights=sample_weights, 
+                num_samples=len(sample_weights), 
+                replacement=True,
+                generator=torch.Generator().manual_seed(42)
+            )
+        
+        # Workers stay alive across epochs and keep 4 batches each in flight.
+        # Encoded GPU-path batches can't be stacked until they are decoded
+        num_workers = min(8, os.cpu_count() or 1)
+        loader_options = {
+            'batch_size': self.batch_size,
+            'num_workers': num_workers,
+            'pin_memory': True,
+            'persistent_workers': num_workers > 0,
+            'prefetch_factor': 4 if num_workers > 0 else None,
+            'collate_fn': collate_encoded if self.gpu_preprocessor is not None else None
+        }
         
         # Create data loaders
-        train_loader = DataLoader(
-            train_dataset, 
-            batch_size=self.batch_size, 
-            sampler=sampler,
-            num_workers=4,
-            pin_memory=True
-        )
-        val_loader = DataLoader(
-            val_dataset, 
-            batch_size=self.batch_size, 
-            shuffle=False,
-            num_workers=4,
-            pin_memory=True
-        )
-        test_loader = DataLoader(
-            test_dataset, 
-            batch_size=self.batch_size, 
-            shuffle=False,
-            num_workers=4,
-            pin_memory=True
-        )
+        train_loader = DataLoader(train_dataset, sampler=sampler, drop_last=True, **loader_options)
+        val_loader = DataLoader(val_dataset, shuffle=False, **loader_options)
+        test_loader = DataLoader(test_dataset, shuffle=False, **loader_options)
         
         logger.info(f"Train samples: {len(train_dataset)}")
         logger.info(f"Validation samples: {len(val_dataset)}")
@@ -297,25 +673,64 @@ class DeepfakeModelTrainer:
         
         return train_loader, val_loader, test_loader
 
+    def autocast(self):
+        """Mixed-precision context for forward passes (no-op off CUDA)"""
+        return torch.autocast(self.device.type, dtype=self.amp_dtype, enabled=self.use_amp)
+
+    def prepare_batch(self, images, labels, train=False):
+        """Move a batch to the device and run GPU preprocessing if enabled"""
+        labels = labels.to(self.device, non_blocking=True)
+        if self.gpu_preprocessor is not None:
+            images = self.gpu_preprocessor(images, train=train)
+        else:
+            images = images.to(self.device, non_blocking=True)
+        return images.contiguous(memory_format=torch.channels_last), labels
+
+    def device_batches(self, data_loader, train=False):
+        """Iterate a loader's batches already prepared on the device"""
+        prepare = lambda images, labels: self.prepare_batch(images, labels, train=train)
+        if self.device.type == 'cuda':
+            # Overlap the next batch's copy and preprocessing with this batch's compute
+            return CUDAPrefetcher(data_loader, prepare)
+        return (prepare(images, labels) for images, labels in data_loader)
+
     def train(self, train_loader, val_loader, epochs=20, learning_rate=1e-4):
         """Train the deepfake detection model"""
         
         # Initialize model
         self.model = EfficientNetDeepfake(self.model_name)
-        self.model.to(self.device)
+        # NHWC lets cuDNN pick its tensor-core conv kernels without transposes
+        self.model.to(self.device, memory_format=torch.channels_last)
+        
+        # One replica per GPU; gradients are all-reduced in buckets during backward
+        if self.distributed:
+            self.model = DDP(
+                self.model, device_ids=[self.device.index],
+                gradient_as_bucket_view=True, static_graph=True
+            )
+        
+        # Fuse EfficientNet's many small ops; max-autotune also captures CUDA graphs.
+        # Train batches have a fixed shape (drop_last) so the graph is built once
+        if self.device.type == 'cuda' and hasattr(torch, 'compile'):
+            self.model = torch.compile(self.model, mode='max-autotune', dynamic=False)
         
         # Setup optimizer and scheduler
+        # fused: one multi-tensor kernel for the whole update (CUDA only)
         optimizer = optim.AdamW(
-            self.model.parameters(), 
+            [p for p in self.model.parameters() if p.requires_grad], 
             lr=learning_rate, 
-            weight_decay=1e-4
+            weight_decay=1e-4,
+            fused=self.device.type == 'cuda'
         )
         scheduler = optim.lr_scheduler.CosineAnnealingLR(
             optimizer, T_max=epochs, eta_min=1e-6
         )
         
         # Loss function with label smoothing
-        criterion = nn.CrossEntropyLoss(label_smoothing=0.1)
+        criterion = nn.CrossEntropyLoss(weight=self.loss_weights, label_smoothing=0.1)
+        
+        # fp16 gradients need loss scaling; a disabled scaler is a pass-through
+        scaler = torch.cuda.amp.GradScaler(enabled=self.use_amp and self.amp_dtype == torch.float16)
         
         # Training loop
         train_losses = []
@@ -327,26 +742,29 @@ class DeepfakeModelTrainer:
             logger.info(f"Epoch {epoch + 1}/{epochs}")
             
             # Training
+            if self.distributed:
+                train_loader.sampler.set_epoch(epoch)
             self.model.train()
             total_train_loss = 0
             train_correct = 0
             train_total = 0
             
-            for images, labels in tqdm(train_loader, desc="Training"):
-                images = images.to(self.device)
-                labels = labels.to(self.device)
-                
-                # Clear gradients
-                optimizer.zero_grad()
+            batches = self.device_batches(train_loader, train=True)
+            for images, labels in tqdm(batches, total=len(train_loader), desc="Training", disable=not self.is_main):
+                # Clear gradients (dropped rather than zero-filled)
+                optimizer.zero_grad(set_to_none=True)
                 
                 # Forward pass
-                outputs = self.model(images)
-                loss = criterion(outputs, labels)
+                with self.autocast():
+                    outputs = self.model(images)
+                    loss = criterion(outputs, labels)
                 
-                # Backward pass
-                loss.backward()
-                torch.nn.utils.clip_grad_norm_(self.model.parameters(), 1.0)
-                optimizer.step()
+                # Backward pass (unscale before clipping so the norm is in real units)
+                scaler.scale(loss).backward()
+                scaler.unscale_(optimizer)
+                torch.nn.utils.clip_grad_norm_(self.model.parameters(), 1.0, foreach=True)
+                scaler.step(optimizer)
+                scaler.update()
                 
                 total_train_loss += loss.item()
                 
@@ -359,24 +777,28 @@ class DeepfakeModelTrainer:
             train_accuracy = train_correct / train_total
             train_losses.append(avg_train_loss)
             
-            # Validation
-            val_loss, val_accuracy = self.evaluate(val_loader)
-            val_losses.append(val_loss)
-            val_accuracies.append(val_accuracy)
-            
             # Update learning rate
             scheduler.step()
             current_lr = optimizer.param_groups[0]['lr']
             
-            logger.info(f"Train Loss: {avg_train_loss:.4f}, Train Acc: {train_accuracy:.4f}")
-            logger.info(f"Val Loss: {val_loss:.4f}, Val Acc: {val_accuracy:.4f}")
-            logger.info(f"Learning Rate: {current_lr:.6f}")
+            # Validation and checkpointing happen once, on rank 0
+            if self.is_main:
+                val_loss, val_accuracy = self.evaluate(val_loader)
+                val_losses.append(val_loss)
+                val_accuracies.append(val_accuracy)
+                
+                logger.info(f"Train Loss: {avg_train_loss:.4f}, Train Acc: {train_accuracy:.4f}")
+                logger.info(f"Val Loss: {val_loss:.4f}, Val Acc: {val_accuracy:.4f}")
+                logger.info(f"Learning Rate: {current_lr:.6f}")
+                
+                # Save best model
+                if val_accuracy > best_val_acc:
+                    best_val_acc = val_accuracy
+                    torch.save(unwrap_model(self.model).state_dict(), 'best_deepfake_model.pth')
+                    logger.info(f"New best model saved with validation accuracy: {val_accuracy:.4f}")
             
-            # Save best model
-            if val_accuracy > best_val_acc:
-                best_val_acc = val_accuracy
-                torch.save(self.model.state_dict(), 'best_deepfake_model.pth')
-                logger.info(f"New best model saved with validation accuracy: {val_accuracy:.4f}")
+            if self.distributed:
+                dist.barrier()
             
         return {
             'train_losses': train_losses,
@@ -385,9 +807,14 @@ class DeepfakeModelTrainer:
             'best_val_accuracy': best_val_acc
         }
 
+    def inference_model(self):
+        """Model for single-process eval (DDP forwards would wait on the other ranks)"""
+        return unwrap_model(self.model) if self.distributed else self.model
+
     def evaluate(self, data_loader):
         """Evaluate model on validation/test set"""
-        self.model.eval()
+        model = self.inference_model()
+        model.eval()
         
         total_loss = 0
         correct = 0
@@ -396,12 +823,10 @@ class DeepfakeModelTrainer:
         criterion = nn.CrossEntropyLoss()
         
         with torch.no_grad():
-            for images, labels in data_loader:
-                images = images.to(self.device)
-                labels = labels.to(self.device)
-                
-                outputs = self.model(images)
-                loss = criterion(outputs, labels)
+            for images, labels in self.device_batches(data_loader):
+                with self.autocast():
+                    outputs = model(images)
+                    loss = criterion(outputs, labels)
                 
                 total_loss += loss.item()
                 
@@ -419,26 +844,31 @@ class DeepfakeModelTrainer:
         """Comprehensive evaluation on test set"""
         logger.info("Running final evaluation on test set...")
         
-        # Load best model
-        self.model.load_state_dict(torch.load('best_deepfake_model.pth'))
-        self.model.eval()
+        # Load best model, rounded to the fp16 weights save_model() ships
+        model = unwrap_model(self.model)
+        model.load_state_dict(torch.load('best_deepfake_model.pth'))
+        model.load_state_dict(half_state_dict(model))
+        model = self.inference_model()
+        model.eval()
         
+        # Per-batch results stay on the device; one copy to the host at the end
         predictions = []
         true_labels = []
         probabilities = []
         
         with torch.no_grad():
-            for images, labels in tqdm(test_loader, desc="Testing"):
-                images = images.to(self.device)
-                labels = labels.to(self.device)
-                
-                outputs = self.model(images)
-                probs = torch.softmax(outputs, dim=1)
-                preds = torch.argmax(outputs, dim=1)
+            batches = self.device_batches(test_loader)
+            for images, labels in tqdm(batches, total=len(test_loader), desc="Testing"):
+                with self.autocast():
+                    outputs = model(images)
                 
-                predictions.extend(preds.cpu().numpy())
-                true_labels.extend(labels.cpu().numpy())
-                probabilities.extend(probs.cpu().numpy())
+                predictions.append(torch.argmax(outputs, dim=1))
+                true_labels.append(labels)
+                probabilities.append(torch.softmax(outputs.float(), dim=1)[:, 1])  # Probability of fake class
+        
+        predictions = torch.cat(predictions).cpu().numpy()
+        true_labels = torch.cat(true_labels).cpu().numpy()
+        probs_fake = torch.cat(probabilities).cpu().numpy()
         
         # Calculate metrics
         accuracy = accuracy_score(true_labels, predictions)
@@ -447,7 +877,6 @@ class DeepfakeModelTrainer:
         )
         
         # Calculate AUC
-        probs_fake = [p[1] for p in probabilities]  # Probability of fake class
         auc = roc_auc_score(true_labels, probs_fake)
         
         results = {
@@ -473,34 +902,65 @@ class DeepfakeModelTrainer:
         # Create directory if it doesn't exist
         os.makedirs(os.path.dirname(model_path), exist_ok=True)
         
-        # Save model
+        # Save model; fp16 weights load into an fp32 model unchanged by load_state_dict
         torch.save({
-            'model_state_dict': self.model.state_dict(),
+            'model_state_dict': half_state_dict(unwrap_model(self.model)),
             'model_name': self.model_name,
-            'img_size': self.img_size
+            'img_size': self.img_size,
+            'weights_dtype': 'float16'
         }, model_path)
         
         logger.info("Model saved successfully")
 
+    def export_onnx(self, onnx_path):
+        """Export the trained model to ONNX (e.g. for trtexec --fp16 / --int8)"""
+        logger.info(f"Exporting ONNX model to {onnx_path}")
+        
+        os.makedirs(os.path.dirname(onnx_path), exist_ok=True)
+        
+        model = unwrap_model(self.model).eval()
+        dummy = torch.zeros(1, 3, self.img_size, self.img_size, device=self.device)
+        torch.onnx.export(
+            model, dummy, onnx_path,
+            input_names=['image'], output_names=['logits'],
+            dynamic_axes={'image': {0: 'batch'}, 'logits': {0: 'batch'}},
+            opset_version=17
+        )
+        
+        logger.info("ONNX model exported successfully")
+
 def main():
     """Main training script"""
     
-    # Configuration
+    # Multi-GPU: torchrun --nproc_per_node=N train_deepfake_model.py
+    distributed = int(os.environ.get('WORLD_SIZE', 1)) > 1
+    if distributed:
+        dist.init_process_group('nccl')
+        torch.cuda.set_device(int(os.environ['LOCAL_RANK']))
+        if dist.get_rank() != 0:
+            logging.getLogger().setLevel(logging.WARNING)
+    
+    # Configuration (batch_size is per GPU)
     config = {
         'data_dir': 'data/deepfake_dataset',
         'model_name': 'efficientnet_b4',
         'img_size': 224,
-        'batch_size': 32,
+        'batch_size': 64,
         'epochs': 20,
         'learning_rate': 1e-4,
-        'model_save_path': '../../ml-models/deepfake/efficientnet_deepfake_model.pth'
+        'face_cache': 'data/deepfake_faces.lmdb',
+        'yunet_model': 'face_detection_yunet_2023mar.onnx',
+        'model_save_path': '../../ml-models/deepfake/efficientnet_deepfake_model.pth',
+        'onnx_export_path': '../../ml-models/deepfake/efficientnet_deepfake_model.onnx'
     }
     
     # Initialize trainer
     trainer = DeepfakeModelTrainer(
         model_name=config['model_name'],
         img_size=config['img_size'],
-        batch_size=config['batch_size']
+        batch_size=config['batch_size'],
+        face_cache=config['face_cache'],
+        yunet_model=config['yunet_model']
     )
     
     # Load data
@@ -517,23 +977,28 @@ def main():
         learning_rate=config['learning_rate']
     )
     
-    # Test model
-    test_results = trainer.test_model(test_loader)
-    
-    # Save model
-    trainer.save_model(config['model_save_path'])
-    
-    # Save training history and results
-    results = {
-        'config': config,
-        'training_history': history,
-        'test_results': test_results
-    }
-    
-    with open('training_results.json', 'w') as f:
-        json.dump(results, f, indent=2)
+    if trainer.is_main:
+        # Test model
+        test_results = trainer.test_model(test_loader)
+        
+        # Save model
+        trainer.save_model(config['model_save_path'])
+        trainer.export_onnx(config['onnx_export_path'])
+        
+        # Save training history and results
+        results = {
+            'config': config,
+            'training_history': history,
+            'test_results': test_results
+        }
+        
+        with open('training_results.json', 'w') as f:
+            json.dump(results, f, indent=2)
+        
+        logger.info("Training completed successfully!")
     
-    logger.info("Training completed successfully!")
+    if distributed:
+        dist.destroy_process_group()
 
 if __name__ == "__main__":
     main()